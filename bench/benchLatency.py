@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Measures the time from the engines' bestmove to GoratschinChess's bestmove.
+# Drives goratschinLauncher.py over stdin/stdout with two mock engines, so it
+# runs on any box without real engines:
+#
+#   python bench/benchLatency.py -g 200
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+launcher = os.path.join(benchDir, "..", "goratschinLauncher.py")
+
+
+def read_stamps(path, count):
+    # the engine writes its stamp just before the bestmove, wait until it is there
+    while True:
+        with open(path) as f:
+            lines = f.read().split()
+        if len(lines) >= count:
+            return [int(x) for x in lines]
+        time.sleep(0.001)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def run(games, think):
+    tmp = tempfile.mkdtemp(prefix="gora-bench-")
+    stamps = [os.path.join(tmp, "boss.txt"), os.path.join(tmp, "counselor.txt")]
+    engines = ["mockEngine.py --move e2e4 --score 20 --think {} --stamp {}".format(think, shlex.quote(stamps[0])),
+               "mockEngine.py --move d2d4 --score 30 --think {} --stamp {}".format(think + 5, shlex.quote(stamps[1]))]
+    proc = subprocess.Popen([sys.executable, launcher, "-e", benchDir, "-n"] + engines,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+
+    def send(cmd):
+        proc.stdin.write(cmd + "\n")
+        proc.stdin.flush()
+
+    def wait_for(prefix):
+        while True:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError("GoratschinChess exited")
+            if line.startswith(prefix):
+                return line
+
+    send("uci")
+    wait_for("uciok")
+    # every move is the same position, the engines have to search each time
+    send("setoption name DecisionCache value 0")
+    send("isready")
+    wait_for("readyok")
+
+    latencies = []
+    for i in range(games):
+        send("position startpos")
+        send("go movetime {}".format(think))
+        wait_for("bestmove")
+        received = time.perf_counter_ns()
+        last = max(read_stamps(stamps[0], i + 1)[i], read_stamps(stamps[1], i + 1)[i])
+        latencies.append((received - last) / 1e6)
+
+    send("quit")
+    proc.wait()
+
+    print("bestmove latency over {} moves (ms): min {:.3f}  p50 {:.3f}  p90 {:.3f}  p99 {:.3f}  max {:.3f}".format(
+          games, min(latencies), percentile(latencies, 50), percentile(latencies, 90),
+          percentile(latencies, 99), max(latencies)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark engine bestmove to GoratschinChess bestmove latency.')
+    parser.add_argument('-g', '--games', type=int, default=100, help='Number of moves to measure.')
+    parser.add_argument('-t', '--think', type=int, default=20, help='Think time of the mock engines in milliseconds.')
+    args = parser.parse_args()
+    run(args.games, args.think)
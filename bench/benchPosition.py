@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Measures the cost of the position commands of one long game, the way a GUI sends
+# them: one 'position startpos moves ...' per ply, each repeating the whole game so far.
+# Compares the incremental update of GoratschinChess._handle_position with a full
+# rebuild of the board on every command.
+#
+#   python bench/benchPosition.py -p 300
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import chess
+
+from goratschinChess import GoratschinChess
+
+
+# a random but legal game with the given number of plies
+def random_game(plies, seed):
+    while True:
+        rnd = random.Random(seed)
+        board = chess.Board()
+        moves = []
+        while len(moves) < plies:
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            move = rnd.choice(legal)
+            board.push(move)
+            moves.append(move.uci())
+        if len(moves) == plies:
+            return moves
+        seed += 1
+
+
+def full_rebuild(commands):
+    board = chess.Board()
+    for command in commands:
+        board.reset()
+        for move in command.split()[3:]:
+            board.push_uci(move)
+    return board
+
+
+def incremental(commands):
+    gc = GoratschinChess("", ["boss", "counselor"], 50)
+    for command in commands:
+        gc._handle_position(command)
+    return gc.board
+
+
+def measure(fn, commands, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        board = fn(commands)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark position command handling over one game.')
+    parser.add_argument('-p', '--plies', type=int, default=300, help='Length of the game in plies.')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='Rounds to run, the best one counts.')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='Seed of the random game.')
+    args = parser.parse_args()
+
+    moves = random_game(args.plies, args.seed)
+    commands = ["position startpos"] + ["position startpos moves " + " ".join(moves[:i]) for i in range(1, len(moves) + 1)]
+
+    fullTime, fullBoard = measure(full_rebuild, commands, args.rounds)
+    incTime, incBoard = measure(incremental, commands, args.rounds)
+    assert fullBoard.fen() == incBoard.fen()
+
+    print("{} position commands over a {} ply game".format(len(commands), args.plies))
+    print("full rebuild: {:8.2f} ms".format(fullTime * 1000))
+    print("incremental:  {:8.2f} ms  ({:.1f}x faster)".format(incTime * 1000, fullTime / incTime))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# End-to-end benchmark of GoratschinChess's own overhead, with mock engines only,
+# so it runs on any box and the results can be reproduced:
+#
+#   python bench/benchSuite.py -g 200 -t 30 --infoRate 500
+#
+# Drives goratschinLauncher.py over stdin/stdout like a GUI and reports
+#  - the time of the uci handshake, including the start of GoratschinChess, and of isready,
+#  - the go to bestmove overhead: the time from go to our bestmove beyond the movetime,
+#  - the info lines per second forwarded to the GUI,
+#  - the stop latency: the time from stop during go infinite to our bestmove.
+# The mock engines play the first legal move, so the moves make up a real game.
+
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from benchLatency import percentile
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+launcher = os.path.join(benchDir, "..", "goratschinLauncher.py")
+
+
+class Driver:
+
+    def __init__(self, engines):
+        self.proc = subprocess.Popen([sys.executable, launcher, "-e", benchDir, "-n"] + engines,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+        # the lines are stamped when they arrive, not when the benchmark gets to them
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            self.lines.put((time.perf_counter(), line.strip()))
+        self.lines.put((time.perf_counter(), None))
+
+    def send(self, cmd):
+        self.proc.stdin.write(cmd + "\n")
+        self.proc.stdin.flush()
+        return time.perf_counter()
+
+    # wait for a line starting with prefix, returns its arrival time, the line
+    # and the number of engine info lines before it
+    def wait_for(self, prefix):
+        infos = 0
+        while True:
+            stamp, line = self.lines.get()
+            if line is None:
+                raise RuntimeError("GoratschinChess exited")
+            if line.startswith(prefix):
+                return stamp, line, infos
+            if line.startswith("info") and not line.startswith("info string"):
+                infos += 1
+
+    def quit(self):
+        self.send("quit")
+        self.proc.wait()
+
+
+def summary(name, values, unit="ms"):
+    return "{:22s} min {:8.3f}  p50 {:8.3f}  p90 {:8.3f}  p99 {:8.3f}  max {:8.3f} {}".format(
+        name, min(values), percentile(values, 50), percentile(values, 90), percentile(values, 99), max(values), unit)
+
+
+def run(args):
+    engines = ["mockEngine.py --move legal --think -1 --score {} --infoRate {} --handshakeDelay {}".format(
+               20 + 10 * i, args.infoRate, args.handshakeDelay) for i in range(args.engines)]
+    driver = Driver(engines)
+
+    sent = driver.send("uci")
+    uciTime = (driver.wait_for("uciok")[0] - sent) * 1000
+    # every position must be searched, not answered from the cache
+    driver.send("setoption name DecisionCache value 0")
+    if args.infoWindow is not None:
+        driver.send("setoption name InfoWindow value {}".format(args.infoWindow))
+    sent = driver.send("isready")
+    readyTime = (driver.wait_for("readyok")[0] - sent) * 1000
+
+    overheads = []
+    infoLines = 0
+    searchTime = 0.0
+    moves = []
+    for i in range(args.moves):
+        if len(moves) >= args.gameLength:
+            moves = []
+        if not moves:
+            driver.send("ucinewgame")
+        driver.send("position startpos" + (" moves " + " ".join(moves) if moves else ""))
+        sent = driver.send("go movetime {}".format(args.movetime))
+        received, line, infos = driver.wait_for("bestmove")
+        overheads.append((received - sent) * 1000 - args.movetime)
+        infoLines += infos
+        searchTime += received - sent
+        move = line.split()[1]
+        moves = moves + [move] if move != "0000" else []
+
+    stopLatencies = []
+    for i in range(args.stops):
+        driver.send("ucinewgame")
+        driver.send("position startpos")
+        driver.send("go infinite")
+        driver.wait_for("info depth")
+        time.sleep(args.movetime / 1000.0)
+        sent = driver.send("stop")
+        stopLatencies.append((driver.wait_for("bestmove")[0] - sent) * 1000)
+
+    driver.quit()
+
+    print("{} mock engines, movetime {} ms, {} info lines/s per engine".format(args.engines, args.movetime, args.infoRate))
+    print("{:22s} uci with startup {:.1f} ms, isready {:.1f} ms".format("handshake", uciTime, readyTime))
+    print(summary("go-bestmove overhead", overheads))
+    print(summary("stop latency", stopLatencies))
+    print("{:22s} {:.0f} lines/s over {} moves".format("info lines to GUI", infoLines / searchTime, args.moves))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark GoratschinChess end to end with mock engines.')
+    parser.add_argument('-g', '--moves', type=int, default=100, help='Number of moves to measure.')
+    parser.add_argument('-t', '--movetime', type=int, default=30, help='Movetime of each go in milliseconds.')
+    parser.add_argument('-n', '--engines', type=int, default=2, help='Number of mock engines.')
+    parser.add_argument('--infoRate', type=int, default=200, help='Info lines per second of each mock engine.')
+    parser.add_argument('--handshakeDelay', type=int, default=0, help="Milliseconds the mock engines take to answer 'uci' and 'isready'.")
+    parser.add_argument('--infoWindow', type=int, help="GoratschinChess's InfoWindow option in ms, its default if not given.")
+    parser.add_argument('--stops', type=int, default=20, help='Number of stop latency measurements.')
+    parser.add_argument('--gameLength', type=int, default=120, help='Plies after which a new game starts.')
+    run(parser.parse_args())
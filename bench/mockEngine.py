@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# A fake UCI engine for benchmarking GoratschinChess without real engines.
+# It plays a fixed move with a fixed score after a fixed think time, and everything
+# it does is deterministic, so runs can be compared:
+#
+#   python mockEngine.py --move e2e4 --score 25 --think 50 --stamp boss.txt
+#   python mockEngine.py --move legal --think -1 --infoRate 200 --handshakeDelay 100
+#   python mockEngine.py --move d2d4 --score 40 --otherScore 10    # scores 'go searchmoves e2e4' with 10
+#
+# With --stamp, the time (time.perf_counter_ns) at which each bestmove is sent
+# is appended to the given file, so a benchmark can measure the latency until
+# GoratschinChess sends its own bestmove.
+
+import argparse
+import sys
+import threading
+import time
+
+import chess
+
+
+# one go command: runs until the think time is over, or until stop with go infinite.
+# With go ponder the think time starts at ponderhit, the reported time at go as with real engines.
+class Search:
+
+    def __init__(self, think, infinite, pondering):
+        self.think = think
+        self.infinite = infinite
+        self.score = 0
+        self.go_time = time.perf_counter()
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+        if not pondering:
+            self.started.set()
+
+
+class MockEngine:
+
+    def __init__(self, args):
+        self.args = args
+        self._lock = threading.Lock()
+        self._search = None
+        self._board = chess.Board()
+        self._searches = 0
+
+    def send(self, text):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+
+    def run(self):
+        for line in sys.stdin:
+            cmd = line.strip()
+            if self.args.log:
+                with open(self.args.log, "a") as f:
+                    f.write(cmd + "\n")
+            if cmd == "uci":
+                time.sleep(self.args.handshakeDelay / 1000.0)
+                self.send("id name MockEngine")
+                self.send("id author GoratschinChess")
+                self.send("option name Threads type spin default 1 min 1 max 512")
+                self.send("option name Hash type spin default 16 min 1 max 33554432")
+                self.send("option name SyzygyPath type string default <empty>")
+                self.send("uciok")
+            elif cmd == "isready":
+                time.sleep(self.args.handshakeDelay / 1000.0)
+                self.send("readyok")
+            elif cmd.startswith("position"):
+                self._position(cmd.split())
+            elif cmd.startswith("go"):
+                self._go(cmd.split())
+            elif cmd == "ponderhit":
+                with self._lock:
+                    if self._search is not None:
+                        self._search.started.set()
+            elif cmd == "stop":
+                with self._lock:
+                    if self._search is not None:
+                        self._search.started.set()
+                        self._search.stopped.set()
+            elif cmd == "quit":
+                break
+
+    def _position(self, words):
+        if "fen" in words:
+            end = words.index("moves") if "moves" in words else len(words)
+            board = chess.Board(" ".join(words[words.index("fen") + 1:end]))
+        else:
+            board = chess.Board()
+        if "moves" in words:
+            for move in words[words.index("moves") + 1:]:
+                board.push_uci(move)
+        self._board = board
+
+    # the move to play and the expected reply. With --move legal the first legal
+    # move in UCI order, so the games stay legal and still deterministic.
+    def _pv(self):
+        if self.args.move != "legal":
+            return [self.args.move, self.args.reply]
+        board = self._board.copy(stack=False)
+        pv = []
+        for i in range(2):
+            moves = sorted(move.uci() for move in board.legal_moves)
+            if not moves:
+                break
+            pv.append(moves[0])
+            board.push_uci(moves[0])
+        return pv or ["0000"]
+
+    def _go(self, words):
+        self._searches += 1
+        if self._searches == self.args.crashAt:
+            sys.exit(3)
+        if self._searches == self.args.hangAt:
+            # alive, but never answers again
+            time.sleep(1e9)
+        think = self.args.think
+        if think < 0:
+            think = int(words[words.index("movetime") + 1]) if "movetime" in words else 50
+        search = Search(think, "infinite" in words, "ponder" in words)
+        pv = self._pv()
+        search.score = self.args.score
+        # searchmoves without our own move: we play the first one, with the other score
+        if "searchmoves" in words:
+            moves = words[words.index("searchmoves") + 1:]
+            if moves and pv[0] not in moves:
+                pv = [moves[0]]
+                search.score = self.args.otherScore if self.args.otherScore is not None else self.args.score
+        with self._lock:
+            if self._search is not None:
+                return
+            self._search = search
+            self._info(search, 1, 0, pv)
+        threading.Thread(target=self._run, args=(search, pv), daemon=True).start()
+
+    def _info(self, search, depth, elapsed, pv):
+        self.send("info depth {} seldepth {} multipv 1 score cp {} nodes {} nps 100000 time {} pv {}"
+                  .format(depth, depth, search.score, 10 + 100 * elapsed, elapsed, " ".join(pv)))
+
+    # send info lines at the info rate until the search ends
+    def _run(self, search, pv):
+        search.started.wait()
+        start = time.perf_counter()
+        interval = 1.0 / self.args.infoRate if self.args.infoRate > 0 else None
+        depth = 1
+        while True:
+            remaining = None if search.infinite else search.think / 1000.0 - (time.perf_counter() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            if interval is None:
+                timeout = remaining
+            elif remaining is None:
+                timeout = interval
+            else:
+                timeout = min(interval, remaining)
+            if search.stopped.wait(timeout):
+                break
+            if interval is not None and (remaining is None or remaining > interval):
+                depth += 1
+                with self._lock:
+                    self._info(search, depth, int((time.perf_counter() - search.go_time) * 1000), pv)
+        self._finish(search, max(depth, self.args.depth), int((time.perf_counter() - search.go_time) * 1000), pv)
+
+    # send the last info line and bestmove, either when the think time is over or on stop
+    def _finish(self, search, depth, elapsed, pv):
+        with self._lock:
+            if self._search is not search:
+                return
+            self._search = None
+            self._info(search, depth, elapsed, pv)
+            if self.args.stamp:
+                with open(self.args.stamp, "a") as f:
+                    f.write(str(time.perf_counter_ns()) + "\n")
+            self.send("bestmove " + pv[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock UCI engine.')
+    parser.add_argument('--move', default='e2e4', help="Move to play, or 'legal' for the first legal move of the position.")
+    parser.add_argument('--reply', default='e7e5', help='Expected reply, the second move of the PV.')
+    parser.add_argument('--score', type=int, default=0, help='Score in centipawns.')
+    parser.add_argument('--otherScore', type=int, help='Score in centipawns of a searchmoves search without our move, default --score.')
+    parser.add_argument('--depth', type=int, default=10, help='Depth to report.')
+    parser.add_argument('--think', type=int, default=50, help="Think time per go in milliseconds, -1 to use the go's movetime.")
+    parser.add_argument('--infoRate', type=int, default=0, help='Info lines per second while searching, 0 for only the first and the last.')
+    parser.add_argument('--handshakeDelay', type=int, default=0, help="Milliseconds before answering 'uci' and 'isready'.")
+    parser.add_argument('--stamp', help='File to append bestmove send times to.')
+    parser.add_argument('--log', help='File to append the received commands to.')
+    parser.add_argument('--crashAt', type=int, default=0, help='Exit at this go command, to test crash handling.')
+    parser.add_argument('--hangAt', type=int, default=0, help='Stop answering at this go command, to test stall handling.')
+    MockEngine(parser.parse_args()).run()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Batch analysis of test suites with GoratschinChess, instead of analyzing positions
+# one at a time by hand. Reads an EPD or FEN file and analyzes the positions with several
+# independent sets of engines at once: each worker process runs its own GoratschinChess
+# with its own engines, pinned to its own cores, and takes the next position when done.
+#
+#   python goratschinBatch.py wac.epd --movetime 2000 --out wac.jsonl \
+#       --goratschin="-e ./engines/ -n lc0.exe stockfish.exe -m 50"
+#
+# One result per position is written as soon as it is known, as JSON lines or, for a
+# file name ending in .csv, as CSV: the moves and scores of all engines, the decision,
+# the time to our bestmove, and for EPD positions with 'bm' or 'am' whether the decision
+# and each engine solved it, and since when (ms of the engine's search) each engine kept
+# a solving move.
+
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import multiprocessing.util
+import shlex
+import sys
+import time
+
+import chess
+
+import goratschinMatch
+from goratschinLauncher import argument_parser, create_goratschin
+from goratschinSession import Session
+
+
+# Positions of an EPD file (with operations like bm, am and id) or a FEN file, one a line.
+# Each position is a dict with fen, id, bm and am, moves in UCI.
+def load_positions(fileName):
+    positions = []
+    with open(fileName) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            board = chess.Board()
+            try:
+                ops = board.set_epd(line)
+            except ValueError:
+                # a FEN with the move counters
+                board = chess.Board(line)
+                ops = {}
+            positions.append({"fen": board.fen(), "id": ops.get("id", str(number)),
+                              "bm": [move.uci() for move in ops.get("bm", [])],
+                              "am": [move.uci() for move in ops.get("am", [])]})
+    return positions
+
+
+# the session of this worker process
+_session = None
+
+
+# worker start: pin the worker to its cores, then start and warm up its engines
+def init_worker(coreQueue, argv):
+    global _session
+    goratschinMatch.init_worker(coreQueue)
+    _session = Session()
+    # the launcher talks to stdout, which is ours
+    with contextlib.redirect_stdout(io.StringIO()):
+        goratschin = create_goratschin(argument_parser().parse_args(argv), _session)
+        goratschin.start_engines()
+    goratschin.warm_up()
+    _session.serve(goratschin)
+    # every position is searched, none is answered from earlier ones
+    _session.send("setoption name DecisionCache value 0")
+    # pool workers do not run atexit
+    multiprocessing.util.Finalize(None, close_worker, exitpriority=10)
+
+
+def close_worker():
+    _session.close()
+    _session.goratschin.exit_handler()
+
+
+def analyse(job):
+    result = _session.analyse(job["position"], job["go"], job["timeout"])
+    result["index"] = job["index"]
+    return result
+
+
+# the go command for the limit arguments
+def go_command(args):
+    if args.depth is not None:
+        return "go depth " + str(args.depth)
+    if args.nodes is not None:
+        return "go nodes " + str(args.nodes)
+    return "go movetime " + str(args.movetime)
+
+
+# columns of a CSV result row, the engines' values numbered from 0 (the boss)
+def csv_row(result):
+    row = {key: result[key] for key in ("index", "id", "fen", "move", "source", "decider", "ms", "solved")}
+    row["bm"] = " ".join(result["bm"])
+    row["am"] = " ".join(result["am"])
+    for i, engine in enumerate(result["engines"]):
+        for key in ("move", "score", "depth", "nodes", "solved", "solvedAt"):
+            row[key + str(i)] = engine[key]
+    return row
+
+
+def run(args):
+    positions = load_positions(args.positions)
+    argv = shlex.split(args.goratschin)
+    goCommand = go_command(args)
+    jobs = [{"index": i, "position": position, "go": goCommand, "timeout": args.timeout}
+            for i, position in enumerate(positions)]
+
+    cores = goratschinMatch.core_sets(args.coresPerPair)
+    concurrency = min(args.concurrency or len(cores), len(jobs)) or 1
+    coreQueue = multiprocessing.Manager().Queue()
+    for i in range(concurrency):
+        coreQueue.put(cores[i % len(cores)])
+    print("{} positions, {}, {} at once, cores per engine set: {}".format(
+          len(jobs), goCommand, concurrency, cores[:concurrency]), file=sys.stderr, flush=True)
+
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    writer = None
+    # positions solved by the decision and by each engine (role -> count), of those with bm or am
+    solved, tested = [0, {}], 0
+    start = time.monotonic()
+    with concurrent.futures.ProcessPoolExecutor(concurrency, initializer=init_worker, initargs=(coreQueue, argv)) as pool:
+        futures = [pool.submit(analyse, job) for job in jobs]
+        for finished, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            result = future.result()
+            if args.out and args.out.lower().endswith(".csv"):
+                row = csv_row(result)
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result["solved"] is not None:
+                tested += 1
+                solved[0] += result["solved"]
+                for engine in result["engines"]:
+                    solved[1][engine["role"]] = solved[1].get(engine["role"], 0) + bool(engine["solved"])
+            print("{} of {}: {} {} ({}){}".format(
+                  finished, len(jobs), result["id"], result["move"], result["decider"] or result["source"],
+                  "" if result["solved"] is None else (" solved" if result["solved"] else " not solved")),
+                  file=sys.stderr, flush=True)
+    if args.out:
+        out.close()
+
+    print("{} positions in {:.1f} s".format(len(jobs), time.monotonic() - start), file=sys.stderr)
+    if tested:
+        print("solved {} of {}, by the engines alone: {}".format(solved[0], tested, ", ".join(
+              "{} {}".format(role, count) for role, count in solved[1].items())), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batch analysis of EPD or FEN positions with GoratschinChess.')
+    parser.add_argument('positions', help='EPD file, or a FEN file with one position a line.')
+    parser.add_argument('--goratschin', default='', help='Arguments for goratschinLauncher.py, in one string.')
+    parser.add_argument('--movetime', type=int, default=1000, help='Ms per position.')
+    parser.add_argument('--depth', type=int, help='Depth per position instead of a time.')
+    parser.add_argument('--nodes', type=int, help='Nodes per position instead of a time.')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Seconds after which a search is stopped.')
+    parser.add_argument('--out', help='Result file, CSV if it ends in .csv, else JSON lines. Default: JSON lines to stdout.')
+    parser.add_argument('--concurrency', type=int, help='Engine sets at once, by default one per set of cores.')
+    parser.add_argument('--coresPerPair', type=int, default=2, help='Cores for the engines of one GoratschinChess.')
+    run(parser.parse_args())
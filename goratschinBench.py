@@ -0,0 +1,75 @@
+import zlib
+
+# The bench of GoratschinChess, like the bench of Stockfish: a fixed set of positions searched
+# through the full decision path at a fixed depth or number of nodes, see GoratschinChess.bench.
+# It reports the nodes and speed of each engine, the time GoratschinChess adds to each
+# position, how often the engines agreed, and a signature of all decisions. With single
+# threaded engines the signature only changes when an engine or the decision logic changed.
+#
+#   bench                  (UCI command, depth 10)
+#   bench nodes 200000
+#   python goratschinLauncher.py -e ./engines/ -n lc0.exe stockfish.exe --bench "depth 12"
+
+benchPositions = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14",
+    "r1bq1r1k/1pp1n1pp/1p1p4/4p2Q/4Pp2/1BNP4/PPP2PPP/3R1RK1 w - - 2 14",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1",
+    "8/8/8/8/5kp1/P7/8/1K1N4 w - - 0 1",
+]
+
+defaultLimit = "depth 10"
+
+
+# the go command for a limit like 'depth 12', 'nodes 100000' or 'movetime 500'
+def bench_go(limit):
+    words = limit.split() if limit else defaultLimit.split()
+    if len(words) != 2 or words[0] not in ("depth", "nodes", "movetime") or not words[1].isdigit():
+        raise ValueError("the bench limit is 'depth N', 'nodes N' or 'movetime N', not '" + limit + "'")
+    return "go " + " ".join(words)
+
+
+# Signature of the decisions: our move, the deciding engine, and each engine's move and score
+def signature(results):
+    text = "\n".join("{} {} {} {}".format(result["fen"], result["move"], result["decider"], " ".join(
+                     "{}:{}".format(engine["move"], engine["score"]) for engine in result["engines"]))
+                     for result in results)
+    return "{:08x}".format(zlib.crc32(text.encode()))
+
+
+# the report lines for the results of all bench positions, see goratschinSession.py
+def bench_report(results, goCommand, seconds):
+    roles = [engine["role"] for engine in results[0]["engines"]] if results else []
+    nodes = [sum(result["engines"][i]["nodes"] or 0 for result in results) for i in range(len(roles))]
+    searchMs = [sum(result["engines"][i]["searchMs"] or 0 for result in results) for i in range(len(roles))]
+    # our own time per position: from go to our bestmove, less the search of the slowest engine
+    overheads = [result["ms"] - max([engine["searchMs"] or 0 for engine in result["engines"]] or [0])
+                 for result in results if result["ms"] is not None]
+    agreed = sum(1 for result in results if len(set(engine["move"] for engine in result["engines"])) == 1)
+    deciders = {role: sum(1 for result in results if result["decider"] == role) for role in roles}
+    lines = [
+        "===========================",
+        "Positions           : {} with '{}'".format(len(results), goCommand),
+        "Total time (ms)     : {}".format(int(seconds * 1000)),
+        "Nodes searched      : {} ({})".format(sum(nodes), ", ".join(
+            "{} {}".format(role, count) for role, count in zip(roles, nodes))),
+        "Nodes/second        : " + ", ".join("{} {}".format(role, int(count * 1000 / ms) if ms > 0 else "?")
+                                             for role, count, ms in zip(roles, nodes, searchMs)),
+        "Overhead/position ms: mean {:.2f}, max {:.2f}".format(
+            sum(overheads) / len(overheads) if overheads else 0.0, max(overheads) if overheads else 0.0),
+        "Engines agreed      : {} of {} ({:.1f} %)".format(agreed, len(results), 100.0 * agreed / max(1, len(results))),
+        "Decisions by        : " + ", ".join("{} {}".format(role, count) for role, count in deciders.items()),
+        "Decision signature  : " + signature(results),
+    ]
+    return lines
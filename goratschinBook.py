@@ -0,0 +1,147 @@
+import random
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from goratschinOptions import spin_value
+
+# Opening book of GoratschinChess.
+# In a gauntlet the engines spend clock on opening positions everyone has seen a thousand
+# times. Positions covered by the book are answered at once, without a search, and the
+# clock saved is left for the middlegame: the time manager budgets from the remaining clock.
+#
+# The book is a Polyglot .bin file, or is built in memory from a PGN collection
+# (any other file name). Moves of games built from PGN are weighted like Polyglot does it:
+# 2 for a win of the side playing the move, 1 for a draw, 0 for a loss.
+
+
+class OpeningBook:
+    # UCI options of the book: name, attribute, type, default, min, max.
+    # For a combo, min holds the choices.
+    options = (
+        ("OwnBook", "enabled", "check", True, None, None),
+        ("BookFile", "file_name", "string", "", None, None),              # Polyglot .bin or PGN, empty for no book
+        ("BookSelection", "selection", "combo", "weighted", ("weighted", "best"), None),
+        ("BookDepth", "depth", "spin", 40, 0, 500),                      # plies from the start the book is used
+    )
+
+    # moves a book built from PGN looks at in each game
+    pgn_plies = 40
+
+    def __init__(self, fileName=None, selection="weighted", depth=40):
+        for name, attr, optType, default, low, high in self.options:
+            setattr(self, attr, default)
+        self.selection = selection
+        self.depth = depth
+        self.hits = 0
+        self._reader = None
+        # Zobrist hash -> {move: weight}, for books built from PGN
+        self._entries = None
+        if fileName:
+            self.load(fileName)
+
+    # set an option by its UCI name, returns False if it is not one of ours.
+    # Raises OSError or ValueError if a book file can not be loaded.
+    def set_option(self, name, value):
+        for optName, attr, optType, default, low, high in self.options:
+            if optName.lower() == name.lower():
+                if optType == "check":
+                    self.enabled = value == "true"
+                elif optType == "spin":
+                    setattr(self, attr, spin_value(value, getattr(self, attr), low, high))
+                elif optType == "combo":
+                    if value in low:
+                        setattr(self, attr, value)
+                else:
+                    self.load(value)
+                return True
+        return False
+
+    def uci_options(self):
+        result = []
+        for name, attr, optType, default, low, high in self.options:
+            current = getattr(self, attr)
+            if optType == "check":
+                result.append("option name {} type check default {}".format(name, "true" if current else "false"))
+            elif optType == "spin":
+                result.append("option name {} type spin default {} min {} max {}".format(name, current, low, high))
+            elif optType == "combo":
+                result.append("option name {} type combo default {}".format(name, current)
+                              + "".join(" var " + choice for choice in low))
+            else:
+                result.append("option name {} type string default {}".format(name, current or "<empty>"))
+        return result
+
+    # load a Polyglot book or build one from a PGN file, an empty name unloads the book
+    def load(self, fileName):
+        self.close()
+        if fileName in ("", "<empty>"):
+            return
+        if fileName.lower().endswith(".bin"):
+            self._reader = chess.polyglot.open_reader(fileName)
+        else:
+            self._entries = self._build(fileName)
+        self.file_name = fileName
+
+    def _build(self, fileName):
+        entries = {}
+        with open(fileName) as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                result = game.headers.get("Result")
+                board = game.board()
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= self.pgn_plies:
+                        break
+                    if result == "1/2-1/2":
+                        weight = 1
+                    elif result == ("1-0" if board.turn else "0-1"):
+                        weight = 2
+                    else:
+                        weight = 0
+                    moves = entries.setdefault(chess.polyglot.zobrist_hash(board), {})
+                    moves[move] = moves.get(move, 0) + weight
+                    board.push(move)
+        return entries
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = None
+        self._entries = None
+        self.file_name = ""
+
+    # the book moves of a position with their weights, only legal ones with a weight
+    def _moves(self, board):
+        if self._reader is not None:
+            candidates = [(entry.move, entry.weight) for entry in self._reader.find_all(board)]
+        elif self._entries is not None:
+            candidates = list(self._entries.get(chess.polyglot.zobrist_hash(board), {}).items())
+        else:
+            return []
+        return [(move, weight) for move, weight in candidates if weight > 0 and board.is_legal(move)]
+
+    # (move, ponder move) from the book, the ponder move is None if the book does not know one.
+    # None if the position is not covered.
+    def probe(self, board):
+        if not self.enabled or board.ply() >= self.depth:
+            return None
+        candidates = self._moves(board)
+        if not candidates:
+            return None
+        if self.selection == "best":
+            move = max(candidates, key=lambda candidate: candidate[1])[0]
+        else:
+            move = random.choices([move for move, weight in candidates],
+                                  [weight for move, weight in candidates])[0]
+        board.push(move)
+        try:
+            replies = self._moves(board)
+            ponder = max(replies, key=lambda candidate: candidate[1])[0] if replies else None
+        finally:
+            board.pop()
+        self.hits += 1
+        return move, ponder
@@ -0,0 +1,93 @@
+import collections
+
+import chess.polyglot
+
+# Cache of the decisions of GoratschinChess, so positions seen moments ago -
+# in analysis sessions, after takebacks, or after the same book exit in a gauntlet -
+# are answered at once instead of searching them again with both engines.
+#
+# Entries are keyed by the Zobrist hash of the position and the kind of search limit.
+# An entry answers a search if it went at least as deep, or as long, as asked for.
+
+
+class CacheEntry:
+    __slots__ = ("move", "ponder", "scores", "depth", "nodes", "time", "line")
+
+    def __init__(self, move, ponder, scores, depth, nodes, time, line):
+        self.move = move
+        self.ponder = ponder
+        self.scores = scores  # score of each engine, relative to the side to move
+        self.depth = depth    # depth reached by all engines
+        self.nodes = nodes    # nodes searched by the engine with the fewest
+        self.time = time      # ms from 'go' to our bestmove
+        self.line = line      # final info line of the deciding engine
+
+
+# kind and amount of a search limit, from the 'go' parameters.
+# Returns None for searches which can not be answered from the cache.
+def search_limit(cmds, target):
+    if cmds.get("depth") is not None:
+        return "depth", int(cmds["depth"])
+    if cmds.get("nodes") is not None:
+        return "nodes", int(cmds["nodes"])
+    if cmds.get("mate") is not None:
+        return None
+    if cmds.get("movetime") is not None:
+        return "time", int(cmds["movetime"])
+    if target is not None:
+        return "time", target
+    return None
+
+
+class DecisionCache:
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def key(self, board, kind):
+        return chess.polyglot.zobrist_hash(board), kind
+
+    def resize(self, size):
+        self.size = size
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    # the entry for key if it is good enough for the amount of the limit, else None
+    def get(self, key, amount):
+        entry = self._entries.get(key)
+        if entry is not None and self._satisfies(entry, key[1], amount):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def _satisfies(self, entry, kind, amount):
+        if kind == "depth":
+            return entry.depth is not None and entry.depth >= amount
+        if kind == "nodes":
+            return entry.nodes is not None and entry.nodes >= amount
+        return entry.time is not None and entry.time >= amount
+
+    # store an entry, unless there is a better one for the same key already
+    def put(self, key, entry):
+        if self.size <= 0:
+            return
+        old = self._entries.get(key)
+        if old is not None and old.time is not None and entry.time is not None and old.time > entry.time \
+                and (old.depth or 0) >= (entry.depth or 0):
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return "{} entries, {} hits, {} misses".format(len(self._entries), self.hits, self.misses)
@@ -4,13 +4,26 @@ import sys
 import math
 import threading
 import subprocess
+import shlex
 import time
 import logging
 import signal
 import atexit
+import collections
 
 import chess.engine
 
+from goratschinBench import bench_go, bench_report, benchPositions
+from goratschinBook import OpeningBook
+from goratschinCache import CacheEntry, DecisionCache, search_limit
+from goratschinOutput import GuiOutput
+from goratschinResources import ResourcePlanner
+from goratschinSession import Session
+from goratschinOptions import spin_value
+from goratschinStream import info_data
+from goratschinTimeline import GameTimeline, write_summary
+from goratschinTime import TimeManager
+
 name = "GoratschinChess"
 version = "1.2"
 fullname = name + '-' + version
@@ -26,12 +39,22 @@ def handle_exit(sig, frame):
 # This class contains the inner workings of goratschinChess. If you want to change its settings or start it then
 # Please go to goratschinLauncher.py That file also lets you change what engines GoratschinChess uses.
 class GoratschinChess:
-    # after a stop command, ignore the finish callback. See _checkResult.
-    _canceled = False
+    # after a decision, ignore the finish callback. See _check_result.
+    _canceled = True
+
+    # stop command received before any engine knew a move, decide on the first bestmove
+    _stopping = False
+
+    # the running search is a 'go ponder', until ponderhit or stop
+    _pondering = False
 
-    # the pythonChess engine objects, loaded from the filePath and fileName
+    # the engine processes, loaded from the filePath and fileName. The first one is the boss,
+    # all others are counselors
     _engines = [None, None]
 
+    # the thread reading the output of all engines
+    _mux = None
+
     # The current move decided by the engine. None when it doesn't know yet
     _moves = [None, None]
         
@@ -59,45 +82,174 @@ class GoratschinChess:
     # Margin in centipawns of which the counselor's eval must be better than the boss.
     score_margin = None
 
-    # time control management
-    # TODO get factor flexible from parameter?
-    tcm_factor = 2 / 3   
+    # How to decide if the engines disagree: 'margin' or 'majority', see _decide
+    decision_rule = "margin"
+    decision_rules = ("margin", "majority")
+
+    # time control management, see goratschinTime.py
+    time_manager = None
+
+    # decisions of earlier searches, see goratschinCache.py
+    decision_cache = None
+
+    # output to the GUI, see goratschinOutput.py
+    output = None
+
+    # records of all decisions, None if not recording
+    recorder = None
+
+    # opening book, see goratschinBook.py
+    book = None
+
+    # split of cores and hash between the engines, see goratschinResources.py
+    resources = None
+
+    # JSON lines of the analysis for subscribers, see goratschinStream.py. None if not streaming
+    stream = None
 
+    # latency and throughput metrics, see goratschinMetrics.py. None if not collected
+    metrics = None
 
-    def __init__(self, engineLocation, engineNames, margin):
+    # scores and decisions of the running game, see goratschinTimeline.py
+    timeline = None
+
+    # which set of engines this is, when several share a stream
+    set_id = 0
+
+    # Seconds to wait for all engines to answer 'uci' with 'uciok' and 'isready' with 'readyok'
+    uci_timeout = None
+    ready_timeout = None
+
+    # Seconds a searching engine may be silent before it counts as hung and is replaced, 0 for never
+    stall_timeout = 30
+
+    # Keep a started spare process of each engine, which replaces it when it crashes
+    hot_spares = False
+
+    # times an engine is replaced at most, an engine which crashes at once should not loop forever
+    max_restarts = 5
+
+    # When boss and counselor disagree in a timed search, each one searches the other's move
+    # for this percent of the target time, see _start_verification. 0 for never.
+    verify_ratio = 20
+    # also let the boss search the counselor's move, not only the counselor the boss's move
+    verify_both = True
+
+
+    def __init__(self, engineLocation, engineNames, margin, uciTimeout=10.0, readyTimeout=30.0, rule="margin",
+                 recorder=None, book=None, hotSpares=False, resources=None, stream=None, metrics=None,
+                 timelineFile=None, setId=0):
         self.engineFolder = engineLocation
         self.engineFileNames = engineNames
         self.score_margin = margin / 100 # given in centipawns, default: 50
+        self.decision_rule = rule
+        # one slot per engine, the first one is the boss
+        count = len(engineNames)
+        self._roles = [role_name(i, count) for i in range(count)]
+        self._engines = [None] * count
+        self._moves = [None] * count
+        self._scores = [None] * count
+        self._scores_white = [None] * count
+        self._info = [None] * count
+        self.listenedTo = [0] * count
+        self.uci_timeout = uciTimeout
+        self.ready_timeout = readyTimeout
+        # handshake state of each engine, set by _check_result
+        self._uciok = [threading.Event() for _ in engineNames]
+        self._readyok = [threading.Event() for _ in engineNames]
+        # number of go commands each engine did not answer with bestmove yet,
+        # and when the oldest of them was sent
+        self._pending = [0 for _ in engineNames]
+        self._pending_since = [0.0 for _ in engineNames]
+        # crash handling: engines which died in the running search, the spare process of each
+        # engine, how often each engine was replaced, and what a replacement must be told
+        self._crashed = set()
+        self.hot_spares = hotSpares
+        self._spares = [None] * count
+        self._restarts = [0] * count
+        # (engine index or None for all, option name) -> (engine index or None, setoption command)
+        self._engine_options = collections.OrderedDict()
+        # option lines of each engine's answer to 'uci', see _engine_option_list
+        self._option_lines = [[] for _ in engineNames]
+        # guards the search state, which is changed by the GUI and by the engine output
+        self._lock = threading.RLock()
+        # the board and the position command it was built from
+        self.board = chess.Board()
+        self._position_base = None
+        self._position_moves = []
+        # the running search: its number, when 'go' arrived, whether we manage its time
+        self.time_manager = TimeManager()
+        self._search_id = 0
+        self._go_time = None
+        # when the engines got the go, before a ponderhit moved _go_time
+        self._engines_go_time = None
+        self._timed = False
+        self._hard_cap_timer = None
+        self._hard_cap = None
+        self._target = None
+        # the verification search of a contested position, see _start_verification
+        self._verification = None
+        # decisions of earlier searches, see goratschinCache.py
+        self.decision_cache = DecisionCache()
+        self._cache_key = None
+        # output to the GUI, see goratschinOutput.py
+        self.output = GuiOutput(sys.stdout)
+        # records of all decisions, see goratschinRecord.py. May be shared with other instances
+        self.recorder = recorder
+        self._record_game = recorder.new_game() if recorder is not None else None
+        # book moves are played without asking the engines, see goratschinBook.py
+        self.book = book if book is not None else OpeningBook()
+        # Threads and Hash are split between the engines, see goratschinResources.py
+        self.resources = resources if resources is not None else ResourcePlanner(count)
+        # the analysis as JSON lines for dashboards, see goratschinStream.py
+        self.stream = stream
+        # when each engine sent its first info and its bestmove in the running search, for the metrics
+        self.metrics = metrics
+        self._first_info = [None] * count
+        self._engine_done = [None] * count
+        self.set_id = setId
+        # analyzed at the end of each game, and appended to the file if given
+        self.timeline = GameTimeline(self._roles)
+        self.timeline_file = timelineFile
                    
     def exit_handler(self):
         log('GoratschinChess clean up...')
-        self.send_command_to_engines("quit")
+        if self._mux is not None:
+            self._mux.quit()
         log('GoratschinChess clean up: all engines quit.')
           
     def start(self):
         atexit.register(self.exit_handler)
         signal.signal(signal.SIGTERM, handle_exit)
         signal.signal(signal.SIGINT, handle_exit)
+        self.start_engines()
+
+        # enter the main program loop
+        self._mainloop(sys.stdin)
+
+
+    # start the engine processes and the thread reading their output
+    def start_engines(self):
         log('Starting ' + fullname)
-        emit_and_log(fullname + " by " + author + " based on CombiChess by T. Friederich")
+        self.emit_and_log(fullname + " by " + author + " based on CombiChess by T. Friederich")
         log('Margin is {:2.2f}'.format(self.score_margin))
         self.init_infos()
+        # one multiplexer thread reads the output of all engines
+        self._mux = EngineMultiplexer(self._check_result, self._engine_exited)
+        self._mux.start()
+        # coalesced engine output is flushed from the multiplexer thread
+        self.output.schedule = self._mux.call_later
         # first start the engines
         for i in range(0, len(self._engines)):
             try:
-                engpath = os.path.join(self.engineFolder, self.engineFileNames[i])
-                proc = subprocess.Popen(engpath, stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
-                self._engines[i] = proc
-
-                # start a stdout handler thread for each engine process
-                eoh = EngineOutputHandler(proc, i, self)
-                eoh.start()
+                command = engine_command(self.engineFolder, self.engineFileNames[i])
+                self._engines[i] = self._mux.spawn(i, command)
+                self.resources.pin(i, self._engines[i].pid)
 
                 engineName = self.engineFileNames[i]  
-                if i == 0:
-                    emit_and_log("info string started engine 0 as boss      (" + engineName + ")")
-                else:
-                    emit_and_log("info string started engine 1 as counselor (" + engineName + ")")
+                self.emit_and_log("info string started engine " + str(i) + " as " + self._roles[i].ljust(9) + " (" + engineName + ")")
+                if self.hot_spares:
+                    self._start_spare(i, command)
                 
             except Exception as e:
                 sys.stderr.write(str(e))
@@ -106,44 +258,173 @@ class GoratschinChess:
                     "\n\nDid you change the script to include the engines you want to use with GoratschinChess?\n")
                 sys.stderr.write("To do this, call GoratschinLauncher.py with argument -e or --enginePath.\n")
                 sys.exit()
-
-        # enter the main program loop
-        self._mainloop()
+        self.emit_and_log("info string resources: " + self.resources.describe())
+        if self.stream is not None:
+            self.stream.start([{"set": self.set_id, "engine": i, "role": self._roles[i], "name": self.engineFileNames[i]}
+                               for i in range(len(self._engines))])
+            self.emit_and_log("info string streaming analysis on " + self.stream.address())
+        if self.metrics is not None:
+            self.metrics.start(list(self._roles))
+            self.emit_and_log("info string metrics on " + self.metrics.address())
+
+        # look for hung engines once a second
+        self._mux.call_later(1.0, self._watch)
+
+
+    # Handshake with the engines before any GUI asks for it, so they load their
+    # networks and tables now. See goratschinDaemon.py
+    def warm_up(self):
+        self._send_and_wait("uci", self._uciok, "uciok", self.uci_timeout)
+        self._send_and_wait("isready", self._readyok, "readyok", self.ready_timeout)
+
+
+    # One UCI session of a client of goratschinDaemon.py on the running engines:
+    # commands are read from lines, the output goes to stream.
+    # At 'quit' or the end of the input the session ends, but the engines keep running
+    # for the next session.
+    def serve(self, lines, stream):
+        self.output.stream = stream
+        self._mainloop(lines, session=True)
+
+
+    # Search the bench positions through the full decision path, see goratschinBench.py.
+    # Returns the report lines. The GUI's output, the stream, book, cache, records, metrics,
+    # game timeline and statistics are left as they were.
+    def bench(self, limit, timeout=600.0):
+        goCommand = bench_go(limit)
+        session = Session()
+        session.engines = [{"set": self.set_id, "engine": i, "role": self._roles[i], "name": self.engineFileNames[i]}
+                           for i in range(len(self._engines))]
+        # the last decision may still be finishing, and must not end up in the bench
+        with self._lock:
+            saved = (self.stream, self.output.stream, self.recorder, self.book.enabled, self.decision_cache, self.metrics,
+                     self.timeline, self.timeline_file, list(self.listenedTo), self.agreed)
+            self.stream, self.recorder, self.book.enabled, self.decision_cache, self.metrics = session, None, False, DecisionCache(0), None
+            self.timeline, self.timeline_file = GameTimeline(self._roles), None
+        start = time.perf_counter()
+        try:
+            session.serve(self)
+            results = [session.analyse({"fen": fen, "id": str(i + 1), "bm": [], "am": []}, goCommand, timeout)
+                       for i, fen in enumerate(benchPositions)]
+            session.close()
+        finally:
+            with self._lock:
+                self.stream, self.output.stream, self.recorder, self.book.enabled, self.decision_cache, self.metrics = saved[:6]
+                self.timeline, self.timeline_file, self.listenedTo, self.agreed = saved[6:]
+        return bench_report(results, goCommand, time.perf_counter() - start)
 
 
     # Main program loop. It keeps waiting for input after a command is finished
-    def _mainloop(self):
+    def _mainloop(self, lines, session=False):
         exitFlag = False
         while not exitFlag:
 
-            userCommand = input()
+            userCommand = lines.readline()
+            # the GUI is gone
+            if not userCommand:
+                userCommand = "quit"
+            userCommand = userCommand.rstrip("\r\n")
 
-            log("Received  cmd: " + userCommand)
+            log("Received  cmd: %s", userCommand)
             
             if userCommand == "uci":
-                emit("id name " + fullname)
-                emit("id author " + author)
-                self.send_command_to_engines("uci")
-                time.sleep(1) #  wait long enough?
-                emit("uciok")
+                self.emit("id name " + fullname)
+                self.emit("id author " + author)
+                self.emit("option name Ponder type check default false")
+                self.emit("option name Margin type spin default " + str(int(round(self.score_margin * 100))) + " min 0 max 1000")
+                self.emit("option name DecisionRule type combo default " + self.decision_rule
+                          + "".join(" var " + rule for rule in self.decision_rules))
+                self.emit("option name DecisionCache type spin default " + str(self.decision_cache.size) + " min 0 max 1000000")
+                self.emit("option name EngineStallTimeout type spin default " + str(self.stall_timeout) + " min 0 max 3600")
+                self.emit("option name VerifyTimeRatio type spin default " + str(self.verify_ratio) + " min 0 max 100")
+                self.emit("option name VerifyBoth type check default " + str(self.verify_both).lower())
+                for option in self.time_manager.uci_options() + self.output.uci_options() + self.book.uci_options():
+                    self.emit(option)
+                self._option_lines = [[] for _ in self._engines]
+                self._send_and_wait("uci", self._uciok, "uciok", self.uci_timeout)
+                for option in self._engine_option_list():
+                    self.emit(option)
+                self.emit("uciok")
 
             elif userCommand == "ucinewgame":
+                self._end_game()
                 self.init_infos()
+                self.time_manager.new_game()
+                if self.recorder is not None:
+                    self._record_game = self.recorder.new_game()
                 self.send_command_to_engines(userCommand)
                 log("Starting new game.")
 
             elif userCommand == "isready":
-                self.send_command_to_engines(userCommand)
-                emit_and_log("readyok")
+                self._send_and_wait(userCommand, self._readyok, "readyok", self.ready_timeout)
+                self.emit_and_log("readyok")
 
             elif userCommand.startswith("setoption"):
-                self.send_command_to_engines(userCommand)
-                log("Done: " + userCommand)
+                optionName, optionValue = parse_setoption(userCommand)
+                if optionName is not None and optionName.lower() == "decisioncache":
+                    self.decision_cache.resize(spin_value(optionValue, self.decision_cache.size, 0, 1000000))
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() == "margin":
+                    margin = spin_value(optionValue, None, 0, 1000)
+                    if margin is None:
+                        self.emit_and_log("info string ignoring Margin '" + str(optionValue) + "', it stays "
+                                          + str(int(round(self.score_margin * 100))))
+                    else:
+                        self.score_margin = margin / 100
+                        self.decision_cache.clear()
+                        log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() == "enginestalltimeout":
+                    self.stall_timeout = spin_value(optionValue, self.stall_timeout, 0, 3600)
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() == "verifytimeratio":
+                    self.verify_ratio = spin_value(optionValue, self.verify_ratio, 0, 100)
+                    self.decision_cache.clear()
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() == "verifyboth":
+                    self.verify_both = optionValue is not None and optionValue.lower() == "true"
+                    self.decision_cache.clear()
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() == "decisionrule":
+                    if optionValue in self.decision_rules:
+                        self.decision_rule = optionValue
+                        self.decision_cache.clear()
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and (self.time_manager.set_option(optionName, optionValue)
+                                                 or self.output.set_option(optionName, optionValue)):
+                    log("Set own option: " + userCommand)
+                elif optionName is not None and optionName.lower() in (option[0].lower() for option in self.book.options):
+                    try:
+                        self.book.set_option(optionName, optionValue)
+                        log("Set own option: " + userCommand)
+                    except (OSError, ValueError) as e:
+                        self.emit_and_log("info string could not load book " + str(optionValue) + ": " + str(e))
+                else:
+                    # the engines will search differently now
+                    self.decision_cache.clear()
+                    index, engineOption = self._route_option(optionName)
+                    if index is not None:
+                        self._send_option_to_engine(index, engineOption, optionValue)
+                    else:
+                        self.send_command_to_engines(userCommand)
+                    log("Done: " + userCommand)
 
             elif userCommand.startswith("go"):
-                self._canceled = False
-                self._moves = [None, None]
-                self._scores = [None, None]
+                with self._lock:
+                    self._canceled = False
+                    self._stopping = False
+                    self._moves = [None] * len(self._engines)
+                    self._scores = [None] * len(self._engines)
+                    self._scores_white = [None] * len(self._engines)
+                    self._info = [None] * len(self._engines)
+                    self._search_id += 1
+                    self._crashed = set()
+                    self._verification = None
+                    self._first_info = [None] * len(self._engines)
+                    self._engine_done = [None] * len(self._engines)
+                    self._go_time = time.perf_counter()
+                    self._engines_go_time = self._go_time
+                    self._pondering = "ponder" in userCommand.split()
+                    self.output.new_search()
 
                 parts = userCommand.split(" ")
                 cmds = {}
@@ -152,71 +433,100 @@ class GoratschinChess:
                     if command in parts:
                         cmds[command] = parts[parts.index(command) + 1]
 
-                engineCommand = "go"
-
-                # do a little time control management
-
-                if cmds.get("wtime") is not None:
-                    if self.board.turn:  # WHITE to move
-                        white_clock = str(int(int(cmds.get("wtime")) * self.tcm_factor))
-                        engineCommand += " wtime " + white_clock 
-                    else:
-                        engineCommand += " wtime " + cmds.get("wtime")
-
-                if cmds.get("btime") is not None:
-                    if not(self.board.turn):  # BLACK to move
-                         black_clock = str(int(int(cmds.get("btime")) * self.tcm_factor))  
-                         engineCommand += " btime " + black_clock 
-                    else:
-                         engineCommand += " btime " + cmds.get("btime") 
-
-                if cmds.get("winc") is not None:  
-                    if self.board.turn:  # WHITE to move
-                        white_inc = str(int(int(cmds.get("winc")) * self.tcm_factor))  
-                        engineCommand += " winc " + white_inc 
-                    else:
-                        engineCommand += " winc " + cmds.get("winc") 
-
-                if cmds.get("binc") is not None:
-                    if not(self.board.turn):  # BLACK to move
-                        black_inc = str(int(int(cmds.get("binc")) * self.tcm_factor))
-                        engineCommand += " binc " + black_inc 
-                    else:
-                        engineCommand += " binc " + cmds.get("binc") 
-
-                if cmds.get("depth") is not None:
-                    engineCommand += " depth " + cmds.get("depth") 
-                if cmds.get("nodes") is not None:
-                   engineCommand += " nodes " + cmds.get("nodes") 
-                if cmds.get("movetime") is not None:
-                    engineCommand += " movetime " + cmds.get("movetime") 
-                if cmds.get("mate") is not None:
-                    engineCommand += " mate " + cmds.get("mate") 
-                if cmds.get("movestogo") is not None:
-                    engineCommand += " movestogo " + cmds.get("movestogo") 
-                if parts[1] == "infinite":
-                    engineCommand += " infinite " 
-
-                self.send_command_to_engines(engineCommand)
+                # book moves need no search, and leave the clock for later. Only in games with
+                # a clock: analysis with a fixed depth, nodes or time wants the engines' search
+                if not self._pondering and ("wtime" in cmds or "btime" in cmds):
+                    bookMove = self.book.probe(self.board)
+                    if bookMove is not None:
+                        self._answer_from_book(*bookMove)
+                        continue
+
+                clock = cmds.get("wtime") if self.board.turn else cmds.get("btime")
+                inc = cmds.get("winc") if self.board.turn else cmds.get("binc")
+                fixedLimit = any(cmds.get(command) is not None for command in ("depth", "nodes", "movetime", "mate"))
+
+                # time control management: we budget the move, the engines get a movetime
+                if clock is not None and not fixedLimit and "infinite" not in parts:
+                    movestogo = int(cmds["movestogo"]) if cmds.get("movestogo") is not None else None
+                    target, hardCap = self.time_manager.budget(int(clock), int(inc or 0), movestogo, self.board)
+                    engineCommand = "go movetime " + str(target)
+                    self._timed = True
+                    self._hard_cap = hardCap
+                    self._target = target
+                    log("Time budget: target %d ms, hard cap %d ms", target, hardCap)
+                else:
+                    target = None
+                    engineCommand = "go"
+                    for command in ("depth", "nodes", "movetime", "mate"):
+                        if cmds.get(command) is not None:
+                            engineCommand += " " + command + " " + cmds.get(command)
+                    if "infinite" in parts:
+                        engineCommand += " infinite"
+                    self._timed = False
+                    self._hard_cap = None
+                    self._target = None
+
+                # answer at once if this position was searched well enough already.
+                # The key has no move history: near a repetition or the 50 move rule the
+                # engines, which see the history, may well play another move.
+                self._cache_key = None
+                limit = None if self._pondering or "infinite" in parts else search_limit(cmds, target)
+                historyMatters = self.board.is_repetition(2) or self.board.halfmove_clock >= 80
+                if limit is not None and self.decision_cache.size > 0 and not historyMatters:
+                    self._cache_key = self.decision_cache.key(self.board, limit[0])
+                    entry = self.decision_cache.get(self._cache_key, limit[1])
+                    if entry is not None:
+                        self._answer_from_cache(entry)
+                        continue
+
+                # while pondering the clock does not run for us, the hard cap starts at ponderhit
+                if self._hard_cap is not None and not self._pondering:
+                    self._start_hard_cap(self._hard_cap)
+                if self._pondering:
+                    engineCommand = "go ponder" + engineCommand[2:]
+                self._start_search(engineCommand)
                 
-                log("Current position to analyze: " + self.board.fen())
-                log("Started analysis with '" + engineCommand + "'")
+                if log_enabled():
+                    log("Current position to analyze: %s", self.board.fen())
+                log("Started analysis with '%s'", engineCommand)
 
             elif userCommand == "stop":
-                self.send_command_to_engines("stop")
-                emit_and_log("info string stopped analysis")
-                time.sleep(3) #  wait long enough?
+                self._stop_search()
+
+            elif userCommand == "bench" or userCommand.startswith("bench "):
+                try:
+                    for line in self.bench(userCommand[5:].strip()):
+                        self.emit_and_log(line)
+                except ValueError as e:
+                    self.emit_and_log("info string " + str(e))
+
+            elif userCommand == "ponderhit":
+                self._ponderhit()
                 
             elif userCommand.startswith("position"):
                 self._pos = userCommand
-                self._handle_position(userCommand)
+                # the last decision may still be logging with the board
+                with self._lock:
+                    self._handle_position(userCommand)
                 self.send_command_to_engines(userCommand)
                 # log("Position " + userCommand)
 
+            elif userCommand == "quit" and session:
+                self._end_session()
+                log("Session ended")
+                exitFlag = True
+
             elif userCommand == "quit":
-                self.send_command_to_engines(userCommand)
-                for engine in self._engines:
-                    engine.terminate()
+                self._end_game()
+                log("Decision cache: " + self.decision_cache.stats())
+                self._mux.quit()
+                self.book.close()
+                if self.stream is not None:
+                    self.stream.close()
+                if self.metrics is not None:
+                    self.metrics.close()
+                if self.recorder is not None:
+                    self.recorder.close()
                 print("Bye.")
                 log('Exiting GoratschinChess')
                 exitFlag = True
@@ -226,7 +536,7 @@ class GoratschinChess:
                 parts = userCommand.split(" ")
                 mpv_mode = parts[1]
                 self.send_command_to_engines("setoption name MultiPV value " + mpv_mode)
-                emit_and_log("setting multi pv mode to " + mpv_mode)
+                self.emit_and_log("setting multi pv mode to " + mpv_mode)
 
             # special tests ...
 
@@ -259,90 +569,401 @@ class GoratschinChess:
                 self.send_command_to_engines("position fen " + self.board.fen())
 
             else:
-                emit_and_log("unknown command" + userCommand)
-
-            time.sleep(0.1)
+                self.emit_and_log("unknown command" + userCommand)
 
 
     def send_command_to_engines(self, cmd):
-        for engine in self._engines:
-           engine.stdin.write(cmd + "\n")
-           if cmd != "quit":
-                engine.stdin.flush()
-
+        optionName, optionValue = parse_setoption(cmd)
+        if self.resources.is_planned(optionName):
+            # each engine gets its share
+            for i in range(len(self._engines)):
+                self._mux.write(i, self._engine_option(i, cmd))
+        else:
+            self._mux.write_all(cmd)
+        # a replacement engine gets the same options, a spare keeps up with them
+        if cmd.startswith("setoption") or cmd in ("isready", "ucinewgame"):
+            with self._lock:
+                if optionName is not None:
+                    self._remember_option(None, optionName, cmd)
+                for i in range(len(self._spares)):
+                    if self._spares[i] is not None:
+                        self._mux.write(("spare", i), self._engine_option(i, cmd))
+
+
+    # a setoption command as one engine gets it, with its share of Threads and Hash
+    def _engine_option(self, index, cmd):
+        optionName, optionValue = parse_setoption(cmd)
+        return self.resources.option_command(index, optionName, optionValue, cmd)
+
+
+    # The options of the engines for the GUI. Each engine's options are named after its role,
+    # like 'Boss Threads' and 'Counselor Hash', so they can be set for each engine.
+    # Threads and Hash are also offered once for all engines, split by the resource planner.
+    def _engine_option_list(self):
+        perEngine = []
+        merged = collections.OrderedDict()
+        for index, lines in enumerate(self._option_lines):
+            for line in lines:
+                name, declaration = parse_option_line(line)
+                if name is None:
+                    continue
+                perEngine.append("option name " + self._roles[index].capitalize() + " " + name + " " + declaration)
+                if self.resources.is_planned(name):
+                    merged.setdefault(name.lower(), (name, []))[1].append(declaration.split())
+        result = []
+        for name, declarations in merged.values():
+            spins = [dict(zip(words[::2], words[1::2])) for words in declarations]
+            if all(spin.get("type") == "spin" for spin in spins):
+                # the totals of all engines
+                result.append("option name {} type spin default {} min {} max {}".format(
+                    name, sum(int(spin.get("default", 1)) for spin in spins),
+                    max(int(spin.get("min", 1)) for spin in spins), sum(int(spin.get("max", 1)) for spin in spins)))
+        return result + perEngine
+
+
+    # the engine a setoption name is for, and the engine's name of the option.
+    # None for options which go to all engines.
+    def _route_option(self, optionName):
+        if optionName is None:
+            return None, optionName
+        # 'counselor 2' before 'counselor'
+        for index in sorted(range(len(self._roles)), key=lambda i: -len(self._roles[i])):
+            prefix = self._roles[index] + " "
+            if optionName.lower().startswith(prefix):
+                return index, optionName[len(prefix):]
+        return None, optionName
+
+
+    # set an option of one engine only
+    def _send_option_to_engine(self, index, optionName, optionValue):
+        cmd = "setoption name " + optionName + ("" if optionValue is None else " value " + optionValue)
+        with self._lock:
+            self._mux.write(index, cmd)
+            self._remember_option(index, optionName, cmd)
+            if self._spares[index] is not None:
+                self._mux.write(("spare", index), cmd)
+
+
+    # keep a setoption for engines which replace a crashed one, the latest one counts
+    def _remember_option(self, index, optionName, cmd):
+        key = (index, optionName.lower())
+        self._engine_options[key] = (index, cmd)
+        self._engine_options.move_to_end(key)
+
+
+    # send the options set so far to a replacement engine or a spare of engine index
+    def _replay_options(self, key, index):
+        for target, cmd in list(self._engine_options.values()):
+            if target is None:
+                self._mux.write(key, self._engine_option(index, cmd))
+            elif target == index:
+                self._mux.write(key, cmd)
+
+
+    # a client left: stop its search without answering, and leave the engines
+    # ready for a new game of the next client
+    def _end_session(self):
+        with self._lock:
+            if not self._canceled:
+                self._canceled = True
+                self.send_command_to_engines("stop")
+            if self._hard_cap_timer is not None:
+                self._hard_cap_timer.cancel()
+                self._hard_cap_timer = None
+            self._pondering = False
+        self._end_game()
+        self.send_command_to_engines("ucinewgame")
+        self.time_manager.new_game()
+        if self.recorder is not None:
+            self._record_game = self.recorder.new_game()
+
+
+    # send a go command to all engines. Each engine answers every go with exactly one bestmove,
+    # so counting them tells the answer to this search from late answers to an earlier one.
+    def _start_search(self, engineCommand):
+        with self._lock:
+            for i in range(len(self._pending)):
+                if self._engines[i] is None:
+                    # still restarting after a crash, the search goes on without it
+                    self._crashed.add(i)
+                else:
+                    self._count_go(i)
+            self.send_command_to_engines(engineCommand)
+            if self.stream is not None and self.stream.subscribers:
+                self.stream.publish({"type": "go", "set": self.set_id, "search": self._search_id, "fen": self.board.fen(), "command": engineCommand})
+
+
+    # stop the search if it is still running when the hard cap of the time budget is reached
+    def _start_hard_cap(self, hardCap):
+        searchId = self._search_id
+        self._hard_cap_timer = threading.Timer(hardCap / 1000.0, self._stop_search, (searchId,))
+        self._hard_cap_timer.daemon = True
+        self._hard_cap_timer.start()
+
+
+    # GUI sent stop, or the hard cap was reached: decide at once on the latest main line
+    # of each engine, even if not all engines have sent their bestmove yet
+    def _stop_search(self, searchId=None):
+        with self._lock:
+            if self._canceled or (searchId is not None and searchId != self._search_id):
+                return
+            if self._pondering:
+                # the opponent played another move, this search does not count for time management
+                self._pondering = False
+                self._timed = False
+            self.send_command_to_engines("stop")
+            self.emit_and_log("info string stopped analysis")
+            for i in range(len(self._engines)):
+                if self._moves[i] is None:
+                    self._take_result(i)
+            if any(move is not None for move in self._moves):
+                self._decide(stopped=True)
+            else:
+                # nothing known yet, take the first bestmove that arrives
+                self._stopping = True
+
+
+    # the opponent played the move we pondered on: the engines go on searching
+    # and the search counts as a normal one from now on
+    def _ponderhit(self):
+        with self._lock:
+            if self._canceled or not self._pondering:
+                return
+            self._pondering = False
+            self.send_command_to_engines("ponderhit")
+            self._go_time = time.perf_counter()
+            if self._hard_cap is not None:
+                self._start_hard_cap(self._hard_cap)
+            # an engine may have finished while pondering
+            self._decide()
+
+
+    # Called from the EngineMultiplexer when an engine process ended on its own.
+    # The running search goes on with the other engines, or is decided with the moves
+    # known so far, and another process takes the place of the engine.
+    def _engine_exited(self, index, returncode):
+        self.emit_and_log("info string engine " + self.engineFileNames[index] + " (" + self._roles[index]
+                          + ") exited with code " + str(returncode))
+        replace = self._restarts[index] < self.max_restarts
+        with self._lock:
+            self._engines[index] = None
+            self._pending[index] = 0
+            # nobody has to wait for its handshake anymore
+            self._uciok[index].set()
+            self._readyok[index].set()
+            # the spare takes over right here, before the GUI can send the next go
+            spare = self._spares[index]
+            if replace and spare is not None and spare.returncode is None:
+                self._restarts[index] += 1
+                self._spares[index] = None
+                self._engines[index] = spare
+                self._mux.promote(("spare", index), index)
+                self._catch_up(index)
+                self.emit_and_log("info string hot spare took over as " + self._roles[index])
+            if not self._canceled:
+                self._crashed.add(index)
+                if self._moves[index] is None:
+                    self._take_result(index)
+                if all(move is None for move in self._moves) and len(self._crashed) == len(self._moves):
+                    self._emergency_move()
+                else:
+                    self._decide(stopped=self._stopping)
+        if not replace:
+            self.emit_and_log("info string engine " + self.engineFileNames[index] + " crashed too often, not replacing it")
+        elif self._engines[index] is None:
+            self._restarts[index] += 1
+            # spawning blocks until the process runs, which must not happen on the multiplexer thread
+            threading.Thread(target=self._restart_engine, args=(index,), daemon=True).start()
+        elif self.hot_spares:
+            command = engine_command(self.engineFolder, self.engineFileNames[index])
+            threading.Thread(target=self._start_spare, args=(index, command), daemon=True).start()
+
+
+    # all engines are gone and none told a move: any legal move is better than losing on time
+    def _emergency_move(self):
+        move = next(iter(self.board.legal_moves), None)
+        if move is None:
+            return
+        self.emit_and_log("info string no engine left with a move, playing " + move.uci())
+        self.emit("bestmove " + move.uci())
+        self._canceled = True
+        if self._hard_cap_timer is not None:
+            self._hard_cap_timer.cancel()
+            self._hard_cap_timer = None
 
-    # Callback handler called from EngineOutputHandler loop
-    def _check_result(self, index, info):
 
-        if self._canceled is True:
+    # start a new process for a dead engine without a spare. Until it runs, searches go on without it.
+    def _restart_engine(self, index):
+        command = engine_command(self.engineFolder, self.engineFileNames[index])
+        try:
+            proc = self._mux.spawn(index, command)
+        except Exception as e:
+            self.emit_and_log("info string could not restart engine " + self.engineFileNames[index] + ": " + str(e))
             return
+        self.resources.pin(index, proc.pid)
+        with self._lock:
+            self._mux.write(index, "uci")
+            self._replay_options(index, index)
+            self._mux.write(index, "isready")
+            self._catch_up(index)
+            self._engines[index] = proc
+        self.emit_and_log("info string restarted engine " + self.engineFileNames[index] + " as " + self._roles[index])
+        if self.hot_spares:
+            self._start_spare(index, command)
+
+
+    # bring a replacement engine to the game the others are in
+    def _catch_up(self, index):
+        self._mux.write(index, "ucinewgame")
+        self._mux.write(index, self._pos)
+
+
+    # start a spare process of an engine, which gets the options of the engine while waiting
+    def _start_spare(self, index, command):
+        try:
+            spare = self._mux.spawn(("spare", index), command)
+        except Exception as e:
+            self.emit_and_log("info string could not start a spare of engine " + self.engineFileNames[index] + ": " + str(e))
+            return
+        self.resources.pin(index, spare.pid)
+        with self._lock:
+            self._mux.write(("spare", index), "uci")
+            self._replay_options(("spare", index), index)
+            self._mux.write(("spare", index), "isready")
+            self._spares[index] = spare
+
+
+    def _count_go(self, index):
+        if self._pending[index] == 0:
+            self._pending_since[index] = time.perf_counter()
+        self._pending[index] += 1
+
+
+    # An engine which owes a bestmove and sent nothing since the go, or since its last
+    # output, for longer than the stall timeout. Also after our decision: a hung engine
+    # would not answer the next go or isready either.
+    def _stalled(self, index, now):
+        if self.stall_timeout <= 0 or self._pending[index] == 0 or self._engines[index] is None:
+            return False
+        lastOutput = max(self._mux.last_output.get(index, 0.0), self._pending_since[index])
+        return now - lastOutput > self.stall_timeout
+
+
+    # kill stalled engines, their exit brings in a replacement. Runs on the multiplexer thread.
+    def _watch(self):
+        with self._lock:
+            now = time.perf_counter()
+            for i in range(len(self._engines)):
+                if self._stalled(i, now):
+                    self.emit_and_log("info string engine " + self.engineFileNames[i] + " did not answer for "
+                                      + str(self.stall_timeout) + " seconds, killing it")
+                    self._mux.kill(i)
+        self._mux.call_later(1.0, self._watch)
+
+
+    # send a handshake command to all engines and wait until each one answered,
+    # but not longer than timeout seconds in total. Engines which are gone or being
+    # restarted are not waited for, a restarted engine does its own handshake, and
+    # neither are stalled ones, which the watchdog kills.
+    def _send_and_wait(self, cmd, events, answer, timeout):
+        with self._lock:
+            now = time.perf_counter()
+            for i, event in enumerate(events):
+                if self._engines[i] is None or self._stalled(i, now):
+                    event.set()
+                else:
+                    event.clear()
+            self.send_command_to_engines(cmd)
+        deadline = time.monotonic() + timeout
+        for i, event in enumerate(events):
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                log("engine " + self.engineFileNames[i] + " did not answer '" + cmd + "' with '" + answer + "' in time")
+
+
+    # Callback handler called from the EngineMultiplexer for every line of engine output
+    def _check_result(self, index, info):
 
         # print_and_flush("got info from " +  self.engineFileNames[index] + " >>> " + info)
         if info is None:
             pass
 
-        elif (info.startswith("id ") or
-             info.startswith("uciok") or 
-             info.startswith("readyok")):
+        elif info.startswith("uciok"):
+            self._uciok[index].set()
+
+        elif info.startswith("readyok"):
+            self._readyok[index].set()
+
+        elif info.startswith("id "):
             pass
 
         elif info.startswith("option"):
-            emit(info)
+            # collected for the GUI until the engine's uciok, see _engine_option_list.
+            # A replacement engine answers 'uci' too, the GUI knows the options already
+            if not self._uciok[index].is_set():
+                self._option_lines[index].append(info)
 
-        elif 'currmove' in info:
+        elif 'bestmove' in info:
+            with self._lock:
+                # a restarted engine may have got the go without being counted for it
+                self._pending[index] = max(0, self._pending[index] - 1)
+                # ignore late answers to an earlier search and answers after a decision
+                if self._pending[index] == 0 and not self._canceled:
+                    if self._verification is not None and index in self._verification.moves:
+                        self._verification.done.add(index)
+                    else:
+                        self._engine_done[index] = time.perf_counter()
+                        self._take_result(index, info.split()[1])
+                    self._decide(stopped=self._stopping)
+
+        # after a decision, ignore the rest of the search, and the output of an earlier one
+        elif self._canceled is True or self._pending[index] > 1:
             pass
 
-        elif 'info depth' in info:
-            emit("info string engine " + self.engineFileNames[index] + " says:")
-            emit(info)
+        elif info.startswith("info"):
+            record = parse_info(info)
+            # only search progress, no currmove and no info strings
+            if record is None:
+                return
+            # a verification search is only for our decision, its line is not ours to show
+            if self._verification is not None and index in self._verification.moves:
+                if record.multipv is None or record.multipv == 1:
+                    self._verification.info[index] = record
+                return
+            if self._first_info[index] is None:
+                self._first_info[index] = time.perf_counter()
+            if self.stream is not None and self.stream.subscribers:
+                self.stream.publish(info_data(self.set_id, self._search_id, index, self._roles[index], record))
+            self.output.info(index, "info string engine " + self.engineFileNames[index] + " says:", record)
             # only store main pv
             # since v0.25.x lc0 doesn't emit 'multipv 1' anymore...
-            if ('multipv 1' in info) or ('multipv' not in info):
-                self._info[index] = info
-
-        elif 'bestmove' in info:
-            self._decide(index)       
+            if record.multipv is None or record.multipv == 1:
+                self._info[index] = record
                    
 
-    # called when 'bestmove' received from any engine               
-    def _decide(self, index):
-
-        if self._canceled is True:
-            return
-
-        boss = 0
-        counselor = 1
-        decider = boss
-               
-        info = self._info[index]
-        parts = info.split()
+    # store move and score of an engine from its latest main line.
+    # Called when the engine sent 'bestmove', or on stop with the line seen so far.
+    def _take_result(self, index, bestMove=None):
+        record = self._info[index]
      
-        pv_start = get_from_info(parts, "pv")
-        if pv_start is None: 
+        if record is not None and record.pv:
+            engineMove = record.pv[0]
+        else:
+            engineMove = bestMove
+        if engineMove is None or engineMove == "(none)":
             return
-        
-        engineMove = parts[pv_start + 1]
+        if bestMove is not None and bestMove != engineMove:
+            # the engine did not finish the line we have seen, we do not know its score
+            engineMove = bestMove
+            record = None
         engineName = self.engineFileNames[index]
         
         # Retrieve the score of the mainline (PV 1) after search is completed.
         # Note that the score is relative to the side to move.
-        score_start = get_from_info(parts, "score")
-        if score_start is None:
-            return
-        
-        cp_marker = parts[score_start + 1]
-        if cp_marker == "mate":
-            # correct score if mating
-            mate_moves= int(parts[score_start + 2])
-            emit("info string mate detected in " + str(mate_moves) + " moves")
-            if mate_moves > 0:
-                cp = 30000 - (mate_moves * 10 )  # we do mate
-            else:
-                cp = -30000 + (mate_moves * 10 ) # we are mated
-        else:
-            cp = int(parts[score_start + 2])
-            
-        cp = cp / 100
+        cp = None
+        if record is not None and record.score is not None:
+            if record.score_type == "mate":
+                self.emit("info string mate detected in " + str(record.score) + " moves")
+            cp = record_score(record)
 
         # log("info string pov score " + str(cp))    
 
@@ -350,79 +971,319 @@ class GoratschinChess:
         
         # white's view
         cpWhite = cp
-        if not(self.board.turn):  # BLACK to move
+        if cp is not None and not(self.board.turn):  # BLACK to move
             cpWhite = -cpWhite
         self._scores_white[index] = cpWhite
 
         # emit_and_log("info string final line " + engineName + ": " + info)
-        emit_and_log("info string final eval " + engineName + ": bm " + str(engineMove) + ", sc " + str(cp))
+        self.emit("info string final eval " + engineName + ": bm " + str(engineMove) + ", sc " + str(cp))
 
         # set the move in the found moves
         self._moves[index] = engineMove
-            
+
+
+    # decide on our move when all engines are done, or right away after a stop
+    def _decide(self, stopped=False):
+
+        if self._canceled is True:
+            return
+
+        # while pondering, bestmove must wait for ponderhit or stop
+        if self._pondering:
+            return
+
+        boss = 0
+        done = [i for i in range(len(self._moves)) if self._moves[i] is not None]
+        # engines which crashed in this search will not send a move
+        searching = [i for i in range(len(self._moves)) if self._moves[i] is None and i not in self._crashed]
+
+        # we dont know our best move yet!
+        if not done or (searching and not stopped):
+            self.emit("info string dont know our best move yet")
+            return
+
+        # the engines disagree: first let them search each other's move
+        if not stopped:
+            if self._verification is None and self._start_verification(done):
+                return
+            if self._verification is not None and self._verification.waiting(self._crashed):
+                return
+
+        self._printResult()
+        agreed = len(done) == len(self._moves) and len(set(self._moves)) == 1
+
         # if all engines are done, and they agree on a move, do that move
-        if self._moves[boss] is not None and self._moves[boss] == self._moves[counselor]:
-            diff = self._scores[counselor] - self._scores[boss]
-            self._printResult(boss, counselor, diff)
-            emit_and_log("info string listening to boss: boss and counselor agree")
+        if agreed:
+            if len(self._moves) == 2:
+                self.emit("info string listening to boss: boss and counselor agree")
+            else:
+                self.emit("info string listening to boss: all engines agree")
             self.listenedTo[boss] += 1
             self.agreed += 1
-            bestMove = self._moves[boss]
-            if diff > 0:
-                decider = counselor
-            else:
-                decider = boss
-
-        # if counselor is much better than boss, do counselor's move
-        elif self._moves[boss] is not None and self._moves[counselor] is not None:
-            diff = self._scores[counselor] - self._scores[boss]
-            self._printResult(boss, counselor, diff)
-            if diff >= self.score_margin:
-                emit_and_log("info string listening to counselor: which is stronger by {:2.2f}".format(diff))
-                decider = counselor
-            elif diff > 0:
-                emit_and_log("info string listening to boss: counselor is stronger, but not enough, only {:2.2f}".format(diff))
-                decider = boss
-            else:
-                emit_and_log("info string listening to boss: counselor is not stronger")
-                decider = boss
-                           
+            decider = boss
+
+        # stopped before all engines knew a move, take what we have
+        elif boss not in done or len(done) == 1:
+            decider = boss if boss in done else max(done, key=self._score_key)
+            self.emit("info string listening to " + self._roles[decider]
+                      + ": " + ("the only engine" if len(done) == 1 else "best engine") + " with a move"
+                      + (" when stopped" if stopped else ""))
             self.listenedTo[decider] += 1
-            bestMove = self._moves[decider]
-                    
-        # we dont know our best move yet!
+
+        elif self.decision_rule == "majority":
+            decider = self._decide_majority(done)
+            self.listenedTo[decider] += 1
+
         else:
-            emit_and_log("info string dont know our best move yet")
-            return
+            decider = self._decide_margin(done)
+            self.listenedTo[decider] += 1
+
+        bestMove = self._moves[decider]
+        # the final info and the ponder move are those of the engine which likes the move most
+        # if all agree, else those of the decider
+        infoSource = max(done, key=self._score_key) if agreed else decider
+
+        # now we have our best move! Into the game's timeline before the GUI knows it,
+        # a ucinewgame right after our bestmove ends the game with this move in it
+        depths = [record.depth if record is not None else None for record in self._info]
+        self.timeline.add(self.board.ply(), bestMove, self._scores_white, depths, decider, agreed)
 
-        # now we have our best move!
-                                    
         # stop all engines
         self.send_command_to_engines("stop")
               
         # send final info to GUI
-        emit_and_log(self._info[decider])
+        record = self._info[infoSource]
+        if record is not None:
+            self.emit(record.line)
         
-        # send bestmove result to GUI
-        emit_and_log("bestmove " + str(bestMove))
+        # send bestmove result to GUI, with the reply the deciding engine expects to ponder on
+        ponderMove = None
+        if record is not None and len(record.pv) > 1 and record.pv[0] == bestMove:
+            ponderMove = record.pv[1]
+        if ponderMove is not None:
+            self.emit("bestmove " + str(bestMove) + " ponder " + ponderMove)
+        else:
+            self.emit("bestmove " + str(bestMove))
+        self._canceled = True
+        self._search_done(agreed, decider, bestMove, ponderMove, record.line if record is not None else None)
+        self._publish_bestmove("engines", bestMove, ponderMove, decider)
+
+        # keep the decision for tuning the policy offline, see goratschinReplay.py
+        if self.recorder is not None:
+            self.recorder.record(self._record_game, self.board, list(self._moves), list(self._scores), depths,
+                                 bestMove, decider, self.decision_rule, self.score_margin)
         
-        # pretty logging of bestmove
-        move = chess.Move.from_uci(bestMove)
-        san_bestmove = self.board.san(move)
-        lan_bestmove = self.board.lan(move)
-        logtext = "Move: " + str(self.board.fullmove_number) + ". "
-        if (self.board.turn == chess.BLACK):
-            logtext += "... "
-        logtext += lan_bestmove + " (" + san_bestmove + ")"
-        log(logtext)
+        # pretty logging of bestmove, one summary record per move
+        if log_enabled():
+            move = chess.Move.from_uci(bestMove)
+            if self.board.is_legal(move):
+                lan_bestmove, san_bestmove = self.board.lan(move), self.board.san(move)
+            else:
+                lan_bestmove, san_bestmove = bestMove, "?"
+            log("Move: %d. %s%s (%s) - %s - listening to %s - listen stats %s, agreed %d",
+                self.board.fullmove_number, "... " if self.board.turn == chess.BLACK else "",
+                lan_bestmove, san_bestmove,
+                " - ".join("%s: bm %s sc %s" % (self._roles[i], self._moves[i], self._scores[i]) for i in range(len(self._moves))),
+                self._roles[decider], tuple(self.listenedTo), self.agreed)
         
         self._printStats()
 
-        self._canceled = True
+
+    # rule 'margin': if the best counselor with another move than the boss is better
+    # than the boss by the margin, do the counselor's move, else always listen to the boss
+    def _decide_margin(self, done):
+        boss = 0
+        counselors = [i for i in done if i != boss and self._moves[i] != self._moves[boss]]
+        if not counselors:
+            self.emit("info string listening to boss: no counselor has another move")
+            return boss
+        best = max(counselors, key=self._score_key)
+        diff = self._verified_diff(best)
+        how = " when verified" if diff is not None else ""
+        if diff is None:
+            diff = score_diff(self._scores[best], self._scores[boss])
+        if diff >= self.score_margin:
+            self.emit("info string listening to " + self._roles[best] + ": which is stronger by {:2.2f}".format(diff) + how)
+            return best
+        elif diff > 0:
+            self.emit("info string listening to boss: " + self._roles[best] + " is stronger, but not enough, only {:2.2f}".format(diff) + how)
+        else:
+            self.emit("info string listening to boss: " + self._roles[best] + " is not stronger" + how)
+        return boss
+
+
+    # The counselor the margin rule would weigh against the boss, if the engines disagree
+    # and the rule has to weigh at all
+    def _contested(self, done):
+        boss = 0
+        if boss not in done:
+            return None
+        counselors = [i for i in done if i != boss and self._moves[i] != self._moves[boss]]
+        if not counselors:
+            return None
+        if self.decision_rule == "majority":
+            votes = collections.Counter(self._moves[i] for i in done).most_common()
+            if len(votes) == 1 or votes[0][1] != votes[1][1]:
+                return None
+        return max(counselors, key=self._score_key)
+
+
+    # The scores of boss and counselor come from different engines with different scales.
+    # In a contested timed search, the counselor searches the boss's move with 'go searchmoves',
+    # and the boss the counselor's move, so each engine scores both moves. The verification
+    # gets a slice of the target time, and only starts if it ends before the hard cap.
+    # Returns False if no verification is needed or there is no time for it.
+    def _start_verification(self, done):
+        if not self._timed or self.verify_ratio == 0 or self._target is None:
+            return False
+        counselor = self._contested(done)
+        if counselor is None:
+            return False
+        boss = 0
+        verifyTime = max(self.time_manager.min_think_time, int(self._target * self.verify_ratio / 100))
+        elapsed = (time.perf_counter() - self._go_time) * 1000
+        if elapsed + verifyTime > self._hard_cap:
+            return False
+        moves = {counselor: self._moves[boss]}
+        if self.verify_both and self._engines[boss] is not None:
+            moves[boss] = self._moves[counselor]
+        if self._engines[counselor] is None:
+            del moves[counselor]
+        if not moves:
+            return False
+        self._verification = Verification(moves)
+        for i, move in moves.items():
+            self._count_go(i)
+            self._mux.write(i, "go movetime " + str(verifyTime) + " searchmoves " + move)
+        self.emit_and_log("info string verifying: " + ", ".join(self._roles[i] + " searches " + move for i, move in moves.items())
+                          + " for " + str(verifyTime) + " ms")
+        return True
+
+
+    # how much better the counselor's move is than the boss's move, by the same engine on both moves:
+    # by the counselor, and the boss if it verified too, on average. None without a verification.
+    def _verified_diff(self, counselor):
+        verification = self._verification
+        if verification is None:
+            return None
+        boss = 0
+        diffs = []
+        counselorOnBoss = verification.score(counselor)
+        if counselorOnBoss is not None and self._scores[counselor] is not None:
+            diffs.append(self._scores[counselor] - counselorOnBoss)
+        bossOnCounselor = verification.score(boss)
+        if bossOnCounselor is not None and self._scores[boss] is not None:
+            diffs.append(bossOnCounselor - self._scores[boss])
+        return sum(diffs) / len(diffs) if diffs else None
+
+
+    # rule 'majority': do the move most engines want, the boss wins among those engines.
+    # Without a clear majority, the margin rule decides.
+    def _decide_majority(self, done):
+        boss = 0
+        votes = collections.Counter(self._moves[i] for i in done).most_common()
+        if len(votes) > 1 and votes[0][1] == votes[1][1]:
+            self.emit("info string no majority, deciding by margin")
+            return self._decide_margin(done)
+        move, count = votes[0]
+        voters = [i for i in done if self._moves[i] == move]
+        decider = boss if boss in voters else max(voters, key=self._score_key)
+        self.emit("info string listening to " + self._roles[decider] + ": " + str(count) + " of "
+                  + str(len(done)) + " engines play " + move)
+        return decider
+
+
+    # sort key for the engines by score, an unknown score is the worst
+    def _score_key(self, index):
+        score = self._scores[index]
+        return score if score is not None else -math.inf
+
+
+    # bookkeeping after our bestmove was sent, line is the final info the GUI got
+    def _search_done(self, agreed, decider, bestMove, ponderMove, line):
+        if self._hard_cap_timer is not None:
+            self._hard_cap_timer.cancel()
+            self._hard_cap_timer = None
+        now = time.perf_counter()
+        elapsed = (now - self._go_time) * 1000
+        if self._timed:
+            searchTimes = [record.time for record in self._info if record is not None and record.time is not None]
+            searchTime = max(searchTimes) if searchTimes else None
+            # after a verification, the engines searched twice
+            if self._verification is not None and searchTime is not None:
+                searchTime += max((record.time for record in self._verification.info.values() if record.time is not None), default=0)
+            # the engines' times count from their go, which was 'go ponder' after a ponderhit
+            self.time_manager.move_done(agreed, (now - self._engines_go_time) * 1000, searchTime)
+        if self._cache_key is not None:
+            depths = [record.depth if record is not None else None for record in self._info]
+            nodes = [record.nodes if record is not None else None for record in self._info]
+            self.decision_cache.put(self._cache_key, CacheEntry(
+                bestMove, ponderMove, list(self._scores),
+                None if None in depths else min(depths),
+                None if None in nodes else min(nodes),
+                elapsed, line))
+        if self.metrics is not None:
+            self.metrics.search_done(self._go_time, elapsed, self._first_info, self._engine_done, self._info, agreed, decider)
+
+
+    # answer a go from the decision cache, without asking the engines
+    def _answer_from_cache(self, entry):
+        with self._lock:
+            self._canceled = True
+        if entry.line is not None:
+            self.emit(entry.line)
+        self.emit_and_log("info string decision cache hit, " + self.decision_cache.stats())
+        if entry.ponder is not None:
+            self.emit_and_log("bestmove " + entry.move + " ponder " + entry.ponder)
+        else:
+            self.emit_and_log("bestmove " + entry.move)
+        if self.metrics is not None:
+            self.metrics.answered("cache")
+        self._publish_bestmove("cache", entry.move, entry.ponder)
+
+    # answer a go with a book move, without asking the engines
+    def _answer_from_book(self, move, ponder):
+        with self._lock:
+            self._canceled = True
+        self.emit_and_log("info string book move " + self.board.san(move) + ", " + str(self.book.hits) + " book moves so far")
+        if ponder is not None:
+            self.emit_and_log("bestmove " + move.uci() + " ponder " + ponder.uci())
+        else:
+            self.emit_and_log("bestmove " + move.uci())
+        if self.metrics is not None:
+            self.metrics.answered("book")
+        self._publish_bestmove("book", move.uci(), ponder.uci() if ponder is not None else None)
+
+    # tell the stream subscribers our move, and where it came from: engines, cache or book
+    def _publish_bestmove(self, source, move, ponder, decider=None):
+        if self.stream is None or not self.stream.subscribers:
+            return
+        data = {"type": "bestmove", "set": self.set_id, "search": self._search_id, "source": source, "fen": self.board.fen(),
+                "move": move, "ponder": ponder}
+        if decider is not None:
+            data.update({"decider": decider, "role": self._roles[decider],
+                         "moves": list(self._moves), "scores": list(self._scores)})
+        self.stream.publish(data)
+
+    # analyze the timeline of the game which ended, see goratschinTimeline.py
+    # Runs on the GUI thread, the timeline is added to on the multiplexer thread.
+    def _end_game(self):
+        with self._lock:
+            if len(self.timeline) == 0:
+                return
+            summary = self.timeline.summary()
+            for line in self.timeline.summary_lines(summary):
+                self.emit_and_log("info string " + line)
+            if self.timeline_file is not None:
+                try:
+                    write_summary(self.timeline_file, summary)
+                except OSError as e:
+                    self.emit_and_log("info string could not write the game summary: " + str(e))
+            self.timeline.clear()
 
     # initialize infos
     def init_infos(self):
-        self.listenedTo = [0, 0]
+        self.listenedTo = [0 for _ in self.engineFileNames]
         self.agreed = 0
 
 
@@ -452,135 +1313,404 @@ class GoratschinChess:
         return ' '.join(result) 
 
 
-    # handle UCI position command
+    # handle UCI position command.
+    # The GUI usually repeats the previous position command with the moves played since
+    # appended, so only the new moves are pushed. The board is only rebuilt from scratch
+    # when the start position or the move history differs.
     def _handle_position(self, positionInput):
         words = positionInput.split()
         # if this is not true, it is not a position command
         assert words[0] == "position"
         try:
+            if "moves" in words:
+                movesStart = words.index("moves")
+                base, moves = words[1:movesStart], words[movesStart + 1:]
+            else:
+                base, moves = words[1:], []
+
+            known = len(self._position_moves)
+            if base == self._position_base and len(moves) >= known and moves[:known] == self._position_moves:
+                newMoves = moves[known:]
             # handle building up the board from a FEN string
-            if words[1] == "fen":
-                rest = positionInput.split(' ', 2)[2]
-                if "moves" in rest:
-                    rest = rest.split()
-                    fen, moves = " ".join(rest[:6]), rest[7:]
-                    self.board.set_fen(fen)
-                    for move in moves:
-                        # emit("Adding " + move + " to stack")
-                        self.board.push_uci(move)
-                else:
-                    self.board.set_fen(rest)
+            elif base[0] == "fen":
+                self.board.set_fen(" ".join(base[1:]))
+                self._position_moves = []
+                newMoves = moves
             # handle board from startpos command, building up the board with moves
-            elif words[1] == "startpos":
+            elif base[0] == "startpos":
                 self.board.reset()
-                for move in words[3:]:  # skip the first two words : 'position' and 'startpos'
-                    # emit("Adding " + move + " to stack")
-                    self.board.push_uci(move)
+                self._position_moves = []
+                newMoves = moves
             else:
-                emit("unknown position type")
+                self.emit("unknown position type")
+                return
+
+            self._position_base = base
+            for move in newMoves:
+                # emit("Adding " + move + " to stack")
+                self.board.push_uci(move)
+                self._position_moves.append(move)
         except Exception as e:
-            emit("something went wrong with the position. Please try again")
-            emit(e)
+            # the board is in an unknown state, rebuild it next time
+            self._position_base = None
+            self.emit("something went wrong with the position. Please try again")
+            self.emit(e)
 
         # show the board
         # emit(self.board)
 
 
-    # prints results of both engines
-    def _printResult(self, boss, counselor, diff):
-          emit_and_log("info string final results - boss: bm " +  str(self._moves[boss]) + " sc " + str(self._scores[boss])
-                + " - counselor: bm " + str(self._moves[counselor]) + " sc " + str(self._scores[counselor])
-                + " diff: {:2.2f}".format(diff))
+    # prints results of all engines, and by how much the best counselor beats the boss
+    def _printResult(self):
+        text = "info string final results - " + " - ".join(
+            self._roles[i] + ": bm " + str(self._moves[i]) + " sc " + str(self._scores[i]) for i in range(len(self._moves)))
+        counselors = [i for i in range(1, len(self._moves)) if self._scores[i] is not None]
+        if self._scores[0] is not None and counselors:
+            diff = max(self._scores[i] for i in counselors) - self._scores[0]
+            text += " diff: {:2.2f}".format(diff)
+        self.emit(text)
 
 
-    # prints stats on how often was listened to boss and how often to counselor
+    # prints stats on how often was listened to boss and how often to the counselors
     def _printStats(self):
-        winBoss, drawBoss, lossBoss = get_win_draw_loss_percentages(self._scores_white[0])
-        emit_and_log("info string Boss      best move: " + str(self._moves[0]) + " score: " + str(self._scores[0])
-                       + " white {:2.1f}% win, {:2.1f}% draw, {:2.1f}% loss".format(winBoss, drawBoss, lossBoss))
-        winCounselor, drawCounselor, lossCounselor = get_win_draw_loss_percentages(self._scores_white[1])
-        emit_and_log("info string Counselor best move: " + str(self._moves[1]) + " score: " + str(self._scores[1])
-                      + " white {:2.1f}% win, {:2.1f}% draw, {:2.1f}% loss".format(winCounselor, drawCounselor, lossCounselor))
-        emit_and_log("info string listen stats [Boss, Counselor] " + str(self.listenedTo))
-        totalSum = self.listenedTo[0] + self.listenedTo[1] 
+        roles = "[" + ", ".join(role.capitalize() for role in self._roles) + "]"
+        width = max(len(role) for role in self._roles)
+        # win/draw/loss of the whole game are in the game summary, see _end_game
+        for i in range(len(self._moves)):
+            if self._scores_white[i] is None:
+                continue
+            self.emit("info string " + self._roles[i].capitalize().ljust(width) + " best move: " + str(self._moves[i])
+                      + " score: " + str(self._scores[i]))
+        self.emit("info string listen stats " + roles + " " + str(self.listenedTo))
+        totalSum = sum(self.listenedTo)
+        if totalSum == 0:
+            return
         bossSum = self.listenedTo[0] 
         bossPercent = (float(bossSum) / float(totalSum)) * 100.0
-        emit_and_log("info string listen stats Boss {:2.1f} %".format(bossPercent))
+        self.emit("info string listen stats Boss {:2.1f} %".format(bossPercent))
         agreedPercent = (float(self.agreed) / float(totalSum)) * 100.0
-        emit_and_log("info string Boss and Counselor agreed so far " + str(self.agreed) + " times, {:2.1f} % ".format(agreedPercent))
+        if len(self._roles) == 2:
+            self.emit("info string Boss and Counselor agreed so far " + str(self.agreed) + " times, {:2.1f} % ".format(agreedPercent))
+        else:
+            self.emit("info string All engines agreed so far " + str(self.agreed) + " times, {:2.1f} % ".format(agreedPercent))
+
+
+    # This function writes to the GUI and flushes, so the UCI GUI sees it
+    def emit(self, text):
+        self.output.write(text)
+
+
+    # This function prints and logs 
+    def emit_and_log(self, text):
+        self.emit(text)
+        log(text)
         
   
 # UTILS
 
-# This function flushes stdout after writing so the UCI GUI sees it
-def emit(text):
-    print(text, flush=True)
- 
-
-# This function logs only 
-def log(text):
-    logger.info(text)
+# This function logs only. Arguments are merged into the message by the log writer,
+# so pass them instead of building the string here.
+def log(msg, *args):
+    logger.info(msg, *args)
 
 
-# This function prints and logs 
-def emit_and_log(text):
-    emit(text)
-    log(text)
+# whether log records go anywhere, to skip building expensive arguments
+def log_enabled():
+    return logger.isEnabledFor(logging.INFO) and logger.hasHandlers()
 
     
-def get_from_info(info, item):
+# name of the role of an engine: the first one is the boss, the others are counselors
+def role_name(index, count):
+    if index == 0:
+        return "boss"
+    if count == 2:
+        return "counselor"
+    return "counselor " + str(index)
+
+
+# split 'setoption name <name> value <value>' into name and value
+def parse_setoption(command):
+    words = command.split()
+    if len(words) < 3 or words[1] != "name":
+        return None, None
+    if "value" in words:
+        valueStart = words.index("value")
+        return " ".join(words[2:valueStart]), " ".join(words[valueStart + 1:])
+    return " ".join(words[2:]), None
+
+
+# name and the rest of an engine's option line: 'option name Hash type spin default 16 ...'
+# gives ('Hash', 'type spin default 16 ...'). (None, None) if it is no option line.
+def parse_option_line(line):
+    words = line.split()
+    if len(words) < 4 or words[1] != "name" or "type" not in words:
+        return None, None
+    typeStart = words.index("type")
+    return " ".join(words[2:typeStart]), " ".join(words[typeStart:])
+
+
+# score of a main line in pawns from the side to move's view, a mate as a very high score
+def record_score(record):
+    if record is None or record.score is None:
+        return None
+    if record.score_type == "mate":
+        mate_moves = record.score
+        if mate_moves > 0:
+            return (30000 - (mate_moves * 10)) / 100  # we do mate
+        return (-30000 + (mate_moves * 10)) / 100     # we are mated
+    return record.score / 100
+
+
+# The verification search of a contested position: each engine in moves searches
+# only the given move, see GoratschinChess._start_verification
+class Verification:
+
+    def __init__(self, moves):
+        self.moves = moves      # engine index -> the move it searches
+        self.info = {}          # engine index -> its latest main line
+        self.done = set()       # engines which sent their bestmove
+
+    # engines still searching, which did not crash
+    def waiting(self, crashed):
+        return [i for i in self.moves if i not in self.done and i not in crashed]
+
+    # an engine's score of its move, None if unknown or the engine searched another move
+    def score(self, index):
+        record = self.info.get(index)
+        if record is None or (record.pv and record.pv[0] != self.moves.get(index)):
+            return None
+        return record_score(record)
+
+
+# difference of two scores, an unknown score counts as no difference
+def score_diff(score, other):
+    if score is None or other is None:
+        return 0.0
+    return score - other
+
+
+# One line of engine search progress, see parse_info
+class InfoRecord:
+    __slots__ = ("line", "depth", "seldepth", "multipv", "score_type", "score",
+                 "nodes", "nps", "time", "pv")
+
+    def __init__(self, line):
+        self.line = line
+        self.depth = None
+        self.seldepth = None
+        self.multipv = None
+        self.score_type = None  # 'cp' or 'mate'
+        self.score = None
+        self.nodes = None
+        self.nps = None
+        self.time = None
+        self.pv = ()
+
+
+# tokens of an info line followed by an integer we keep
+_info_int_fields = frozenset(("depth", "seldepth", "multipv", "nodes", "nps", "time"))
+# tokens followed by one value we do not keep
+_info_skip_fields = frozenset(("hashfull", "tbhits", "sbhits", "cpuload", "currmovenumber"))
+# tokens which make a line no search progress line
+_info_other = frozenset(("string", "currmove", "currline", "refutation"))
+
+# Parse an engine info line in a single pass.
+# Returns an InfoRecord, or None if the line is no search progress line with a depth.
+def parse_info(line):
+    parts = line.split()
+    count = len(parts)
+    if count < 2 or parts[0] != "info":
+        return None
+    record = InfoRecord(line)
+    i = 1
     try:
-        return info.index(item)
-    except ValueError:
+        while i < count:
+            token = parts[i]
+            if token in _info_int_fields:
+                setattr(record, token, int(parts[i + 1]))
+                i += 2
+            elif token == "score":
+                record.score_type = parts[i + 1]
+                record.score = int(parts[i + 2])
+                i += 3
+                if i < count and (parts[i] == "lowerbound" or parts[i] == "upperbound"):
+                    i += 1
+            elif token == "pv":
+                record.pv = tuple(parts[i + 1:])
+                break
+            elif token in _info_other:
+                return None
+            elif token == "wdl":
+                i += 4
+            elif token in _info_skip_fields:
+                i += 2
+            else:
+                i += 1
+    except (ValueError, IndexError):
         return None
+    if record.depth is None:
+        return None
+    return record
   
 
-# get score as win/draw/loss percentages  
-def get_win_draw_loss_percentages(pawn_value):
-    ## w = 1 / (1 + pow( 10, (- (abs(pawn_value) / 4)))) * 100 # - 50 + (abs(pawn_value) / 10)
-    ## q = (math.degrees(math.atan(abs(pawn_value) / 290.680623072))) / 1.548090806     
-    ## w = q # * 5000 + 5000
-    w = cp2q(abs(pawn_value)) * 100
-    if (pawn_value >= 0):
-        return w, 100 - w, 0
+# build the command line for an engine file name in the engine folder.
+# Python scripts (e.g. the mock engine in bench/) are run with the current interpreter,
+# and a name that is not a file may carry arguments, like "mockEngine.py --move e2e4".
+def engine_command(folder, fileName):
+    path = os.path.join(folder, fileName)
+    if os.path.isfile(path):
+        args = [path]
     else:
-        return 0, 100 - w, w
-    
-
-# from lc0_analyzer-extras
-
-def q2cp(q):
-    return 290.680623072 * math.tan(1.548090806 * q) / 100.0
-
-    # New formula is cp = 90 × tan(1.5637541897 × q)
-    # doesnt work well here ?!
-    # return 90 * math.tan(1.5637541897 * q)
+        args = shlex.split(fileName, posix=(os.name != "nt"))
+        args[0] = os.path.join(folder, args[0])
+    if args[0].endswith(".py"):
+        args.insert(0, sys.executable)
+    return args
+
+
+# one thread that reads the stdout of all engine processes.
+# It runs an asyncio event loop which watches every engine pipe and calls back
+# with each line as soon as it arrives, so there is no polling and no sleeping.
+#
+# Processes are known by a key: the engine index, or ("spare", index) for the hot spare
+# of an engine, whose output is not passed on until it is promoted to be the engine.
+class EngineMultiplexer(threading.Thread):
+    # lc0 may send very long PV lines
+    line_limit = 1024 * 1024
+
+    def __init__(self, callback, exitCallback=None):
+        threading.Thread.__init__(self, name="EngineMultiplexer", daemon=True)
+        self.callback = callback
+        # called with the engine index and the exit code when an engine process ends by itself
+        self.exit_callback = exitCallback
+        self.loop = asyncio.new_event_loop()
+        self._procs = {}
+        self._keys = {}
+        # key -> time.perf_counter() of the last line of the process
+        self.last_output = {}
+        self._quitting = False
 
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # start an engine process and its reader, blocks until the process is running
+    def spawn(self, index, command):
+        future = asyncio.run_coroutine_threadsafe(self._spawn(index, command), self.loop)
+        return future.result()
+
+    async def _spawn(self, key, command):
+        proc = await asyncio.create_subprocess_exec(*command,
+                                                    stdin=subprocess.PIPE,
+                                                    stdout=subprocess.PIPE,
+                                                    limit=self.line_limit)
+        self._procs[key] = proc
+        self._keys[proc] = key
+        self.loop.create_task(self._read(proc))
+        return proc
+
+    async def _read(self, proc):
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            # the key changes when a spare is promoted
+            key = self._keys.get(proc)
+            self.last_output[key] = time.perf_counter()
+            if not isinstance(key, int):
+                continue
+            try:
+                # call back
+                self.callback(key, line.decode(errors="replace").rstrip())
+            except Exception:
+                logger.exception("error handling output of engine %d", key)
+        await proc.wait()
+        key = self._keys.pop(proc, None)
+        if key is not None and self._procs.get(key) is proc:
+            del self._procs[key]
+        if isinstance(key, int) and not self._quitting and self.exit_callback is not None:
+            try:
+                self.exit_callback(key, proc.returncode)
+            except Exception:
+                logger.exception("error handling the exit of engine %d", key)
 
-def cp2q(cp):
-    return math.atan(cp*100.0/290.680623072)/1.548090806
+    # let a spare take the place of an engine, may be called from any thread
+    def promote(self, spareKey, index):
+        self._call(self._promote, spareKey, index)
 
-    # New formula is cp = 90 × tan(1.5637541897 × q), inverse:
-    # return math.atan(cp/90)/1.5637541897
-    # doesnt work well here ?!
+    def _promote(self, spareKey, index):
+        proc = self._procs.pop(spareKey, None)
+        if proc is None:
+            return
+        old = self._procs.get(index)
+        if old is not None:
+            self._keys.pop(old, None)
+        self._procs[index] = proc
+        self._keys[proc] = index
+        self.last_output[index] = time.perf_counter()
+
+    # kill a hung engine process, may be called from any thread
+    def kill(self, key):
+        self._call(self._kill, key)
+
+    def _kill(self, key):
+        proc = self._procs.get(key)
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
 
+    # send a command to one engine, may be called from any thread
+    def write(self, index, cmd):
+        self._call(self._write, index, cmd + "\n")
 
-# a stdout handler thread for an engine process
-class EngineOutputHandler(threading.Thread):
-    def __init__(self, proc, index, outer_class):
-        threading.Thread.__init__(self)
-        self.proc = proc
-        self.index = index
-        self.outer_class = outer_class
-        
+    # send a command to all engines, may be called from any thread
+    def write_all(self, cmd):
+        self._call(self._write_all, cmd + "\n")
 
-    def run(self):
-        while self.proc.poll() == None:
-            # log("waiting for info...")
-            info = self.proc.stdout.readline().rstrip()
-            # log("Got info: '" + info + "'")
-            
-            # call back
-            self.outer_class._check_result(self.index, info)
-            
-            time.sleep(0.01) # needed for time control management
+    def _write(self, index, data):
+        proc = self._procs.get(index)
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.stdin.write(data.encode())
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning("engine %s does not accept input anymore", index)
+
+    def _write_all(self, data):
+        for key in self._procs:
+            if isinstance(key, int):
+                self._write(key, data)
+
+    # send quit to all engines and kill those which did not exit in time.
+    # Blocks until all engine processes are gone.
+    def quit(self, timeout=2.0):
+        if not self.loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self._quit(timeout), self.loop)
+        future.result()
+
+    async def _quit(self, timeout):
+        self._quitting = True
+        for key in self._procs:
+            self._write(key, "quit\n")
+        for proc in list(self._procs.values()):
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                try:
+                    proc.terminate()
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+
+    # run fn after delay seconds on the event loop thread, may be called from any thread
+    def call_later(self, delay, fn):
+        self._call(self.loop.call_later, delay, fn)
+
+    # run fn on the event loop thread, directly if we are already on it
+    def _call(self, fn, *args):
+        if threading.current_thread() is self:
+            fn(*args)
+        elif self.loop.is_running():
+            self.loop.call_soon_threadsafe(fn, *args)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Thin UCI client of goratschinDaemon.py, the engine command for the GUI.
+# It only connects to the daemon and copies the GUI's input to it and its output back,
+# so the GUI gets 'uciok' from engines which are already running and warmed up.
+#
+#   python goratschinClient.py                    # default Unix socket, or TCP port on Windows
+#   python goratschinClient.py --port 7711
+#
+# Keep this file free of heavy imports, its startup time is the GUI's wait.
+
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+# where the daemon listens by default
+defaultSocket = os.path.join(tempfile.gettempdir(), "goratschin.sock")
+defaultHost = "127.0.0.1"
+defaultPort = 7711
+
+
+# Unix socket if this OS has them and no port is given, TCP otherwise
+def use_tcp(args):
+    return args.port is not None or not hasattr(socket, "AF_UNIX")
+
+
+def add_address_arguments(parser):
+    parser.add_argument('--socket', default=defaultSocket, help='Unix socket of the daemon.')
+    parser.add_argument('--host', default=defaultHost, help='Host of the daemon, with --port.')
+    parser.add_argument('--port', type=int, help='TCP port of the daemon, instead of the Unix socket. Default on Windows: ' + str(defaultPort) + '.')
+
+
+def connect(args):
+    if use_tcp(args):
+        sock = socket.create_connection((args.host, args.port or defaultPort))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(args.socket)
+    return sock
+
+
+# GUI to daemon. At the end of the input the daemon ends the session.
+def forward_input(sock):
+    for line in sys.stdin.buffer:
+        sock.sendall(line)
+    sock.shutdown(socket.SHUT_WR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='UCI client of the GoratschinChess daemon.')
+    add_address_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sock = connect(args)
+    except OSError as e:
+        sys.stderr.write("GoratschinChess Error: could not connect to the daemon: " + str(e) + "\n")
+        sys.stderr.write("Start it with goratschinDaemon.py first.\n")
+        sys.exit(1)
+
+    threading.Thread(target=forward_input, args=(sock,), daemon=True).start()
+
+    # daemon to GUI, until the daemon closes the session
+    out = sys.stdout.buffer
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        out.write(data)
+        out.flush()
+    # the input thread may still wait for the GUI, do not wait for it
+    os._exit(0)
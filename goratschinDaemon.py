@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# GoratschinChess as a daemon: the engines are started and warmed up once, and stay alive
+# across GUI sessions, so lc0 loads its network once and not on every GUI launch.
+# GUIs launch goratschinClient.py as the engine, which connects to the daemon.
+#
+#   python goratschinDaemon.py -e ./engines/ -n lc0.exe stockfish.exe --pairs 2
+#   python goratschinDaemon.py --port 7711 ...     # TCP instead of the Unix socket
+#
+# Takes the arguments of goratschinLauncher.py. Each of the --pairs sets of engines
+# serves one session at a time, more clients wait for a free set.
+# Options a session sets stay set for the next session on the same engines.
+
+import io
+import os
+import queue
+import socket
+import signal
+import socketserver
+import sys
+
+from goratschinChess import handle_exit
+from goratschinClient import add_address_arguments, defaultPort, use_tcp
+from goratschinLauncher import argument_parser, configure_logging, create_goratschin, create_metrics, create_recorder, create_stream
+
+
+# output to a client. A client may leave at any time, what is written after that is dropped.
+class ClientStream:
+
+    def __init__(self, wfile):
+        self._file = wfile
+        self.closed = False
+
+    def write(self, text):
+        if not self.closed:
+            try:
+                self._file.write(text.encode())
+            except OSError:
+                self.closed = True
+
+    def flush(self):
+        if not self.closed:
+            try:
+                self._file.flush()
+            except OSError:
+                self.closed = True
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        if use_tcp(self.server.args):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        goratschin = self.server.idle.get()
+        stream = ClientStream(self.wfile)
+        try:
+            goratschin.serve(io.TextIOWrapper(self.rfile, encoding="utf-8", errors="replace"), stream)
+        finally:
+            stream.closed = True
+            self.server.idle.put(goratschin)
+
+
+class TcpDaemon(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+
+if __name__ == "__main__":
+    parser = argument_parser('GoratschinChess daemon serving UCI sessions over a socket.')
+    add_address_arguments(parser)
+    parser.add_argument('--pairs', type=int, default=1, help='Number of engine sets, each serves one session at a time.')
+    args = parser.parse_args()
+
+    configure_logging(args)
+    signal.signal(signal.SIGTERM, handle_exit)
+
+    # start and warm up all engines before accepting sessions.
+    # All sets publish to the same analysis stream, add up the same metrics and write
+    # to the same decision records, if any
+    stream = create_stream(args)
+    metrics = create_metrics(args)
+    recorder = create_recorder(args)
+    instances = []
+    idle = queue.Queue()
+    for i in range(args.pairs):
+        goratschin = create_goratschin(args, stream, metrics, recorder, i)
+        goratschin.start_engines()
+        goratschin.warm_up()
+        instances.append(goratschin)
+        idle.put(goratschin)
+
+    if use_tcp(args):
+        server = TcpDaemon((args.host, args.port or defaultPort), SessionHandler)
+        address = "{}:{}".format(args.host, args.port or defaultPort)
+    else:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = socketserver.ThreadingUnixStreamServer(args.socket, SessionHandler)
+        address = args.socket
+    # a session of a client which is gone must not keep the daemon alive
+    server.daemon_threads = True
+    server.args = args
+    server.idle = idle
+    print("GoratschinChess daemon listening on " + address, flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not use_tcp(args) and os.path.exists(args.socket):
+            os.remove(args.socket)
+        for goratschin in instances:
+            goratschin.exit_handler()
+        if stream is not None:
+            stream.close()
+        if metrics is not None:
+            metrics.close()
+        if recorder is not None:
+            recorder.close()
+        sys.exit(0)
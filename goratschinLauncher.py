@@ -10,7 +10,13 @@ import logging
 import sys
 import datetime
 
+from goratschinBook import OpeningBook
 from goratschinChess import GoratschinChess
+from goratschinLog import start_file_logging
+from goratschinMetrics import Metrics
+from goratschinRecord import MoveRecorder
+from goratschinResources import ResourcePlanner
+from goratschinStream import AnalysisStream
 
 
 # folder and file names for the engines.
@@ -18,32 +24,108 @@ engineFolderDefault = "./engines/"
 engineFileNames = ["lc0.exe", "stockfish.exe"]
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='UCI ches engine.')
+# the command line arguments of GoratschinChess, also used by goratschinDaemon.py
+def argument_parser(description='UCI ches engine.'):
+    parser = argparse.ArgumentParser(description=description)
     parser.add_argument('-log', help='Name of log file.')
+    parser.add_argument('--logSize', type=int, default=10, help='Size in MB at which the log file is rotated.')
+    parser.add_argument('--logBackups', type=int, default=5, help='Number of rotated log files to keep.')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output. Changes log level from INFO to DEBUG.')
     parser.add_argument('-e', '--engineFolder', help='Engine folder.')
+    parser.add_argument('-n', '--engines', nargs='+', help='Engine file names in the engine folder, boss first, then one or more counselors. Defaults to ' + str(engineFileNames) + '.')
     parser.add_argument('-m', '--margin', type=int, default=50, help="Margin in centipawns of which the counselor's eval must be better than the boss.")
-    args = parser.parse_args()
-
-    print('args :'  + str(args), flush=True)
+    parser.add_argument('-r', '--rule', choices=GoratschinChess.decision_rules, default='margin',
+                        help="How to decide when the engines disagree: best counselor beats the boss by the margin, or majority vote.")
+    parser.add_argument('--record', help='Append a JSON line per decision to this file, for goratschinReplay.py.')
+    parser.add_argument('--timeline', help='Append a JSON line per game with its win/draw/loss curves, divergence and swings to this file.')
+    parser.add_argument('-b', '--book', help='Opening book: a Polyglot .bin file, or a PGN file to build one from.')
+    parser.add_argument('--bookSelection', choices=('weighted', 'best'), default='weighted',
+                        help='Pick book moves at random by weight, or always the one with the highest weight.')
+    parser.add_argument('--bookDepth', type=int, default=40, help='Number of plies from the start the book is used for.')
+    parser.add_argument('--coreShares', type=int, nargs='+', help="Shares of the cores and of 'Threads' for each engine, e.g. 3 1. Equal shares by default.")
+    parser.add_argument('--hashShares', type=int, nargs='+', help="Shares of 'Hash' for each engine. Equal shares by default.")
+    parser.add_argument('--noPinning', action='store_true', help='Do not pin the engines to their cores.')
+    parser.add_argument('--hotSpares', action='store_true', help='Keep a spare process of each engine running, which takes over at once if the engine crashes.')
+    parser.add_argument('--streamSocket', help='Stream the analysis as JSON lines to subscribers of this Unix socket.')
+    parser.add_argument('--streamPort', type=int, help='Stream the analysis as JSON lines to subscribers of this TCP port on localhost.')
+    parser.add_argument('--metricsPort', type=int, help='Serve metrics of latency and engine throughput over HTTP on this localhost port.')
+    parser.add_argument('--metricsFile', help='Write the metrics as JSON to this file.')
+    parser.add_argument('--metricsInterval', type=float, default=10.0, help='Seconds between writes of the metrics file.')
+    parser.add_argument('--bench', nargs='?', const='depth 10', metavar='LIMIT',
+                        help="Run the bench positions with this limit, e.g. 'depth 12' or 'nodes 200000', print the report and exit.")
+    parser.add_argument('--uciTimeout', type=float, default=10.0, help="Seconds to wait for all engines to answer 'uci'.")
+    parser.add_argument('--readyTimeout', type=float, default=30.0, help="Seconds to wait for all engines to answer 'isready'.")
+    return parser
 
-    # configure logging
 
+def configure_logging(args):
     logger = logging.getLogger("goratschinChess")   
     logger.setLevel(logging.DEBUG if args.verbose else logging.INFO) 
     if args.log:
         now = datetime.datetime.now()
-        f_handler = logging.FileHandler(args.log + '-' + str(now)[:10] + ".log")
-        f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        f_handler.setFormatter(f_format)
-        logger.addHandler(f_handler)
-    
+        start_file_logging(logger, args.log + '-' + str(now)[:10] + ".log", args.logSize * 1024 * 1024, args.logBackups)
+
+
+# the analysis stream for the arguments, None if not streaming
+def create_stream(args):
+    if args.streamSocket is None and args.streamPort is None:
+        return None
+    return AnalysisStream(args.streamSocket, args.streamPort)
+
+
+# the metrics for the arguments, None if not collected
+def create_metrics(args):
+    if args.metricsPort is None and args.metricsFile is None:
+        return None
+    return Metrics(args.metricsPort, args.metricsFile, args.metricsInterval)
+
+
+# the decision recorder for the arguments, None if not recording
+def create_recorder(args):
+    if args.record is None:
+        return None
+    return MoveRecorder(args.record)
+
+
+# a GoratschinChess instance for the arguments, its engines are not started yet.
+# Instances may share one stream, one set of metrics and one recorder, setId tells
+# their records in the stream apart.
+def create_goratschin(args, stream=None, metrics=None, recorder=None, setId=0):
     enginesDir = args.engineFolder if args.engineFolder else engineFolderDefault
     
     print('engine folder specified: ' + str(enginesDir), flush=True)
 
-    # start the goratschinChess engine
-    GoratschinChess(enginesDir, engineFileNames, args.margin).start()
+    engineNames = args.engines if args.engines else engineFileNames
+
+    book = OpeningBook(args.book, args.bookSelection, args.bookDepth)
+
+    resources = ResourcePlanner(len(engineNames), args.coreShares, args.hashShares, not args.noPinning)
+
+    return GoratschinChess(enginesDir, engineNames, args.margin, args.uciTimeout, args.readyTimeout, args.rule,
+                           recorder if recorder is not None else create_recorder(args), book, args.hotSpares, resources,
+                           stream if stream is not None else create_stream(args),
+                           metrics if metrics is not None else create_metrics(args), args.timeline, setId)
+
+
+if __name__ == "__main__":
+    args = argument_parser().parse_args()
+
+    print('args :'  + str(args), flush=True)
+
+    # configure logging
+    configure_logging(args)
+
+    goratschin = create_goratschin(args)
+    if args.bench:
+        goratschin.start_engines()
+        goratschin.warm_up()
+        try:
+            for line in goratschin.bench(args.bench):
+                print(line, flush=True)
+        finally:
+            goratschin.exit_handler()
+    else:
+        # start the goratschinChess engine
+        goratschin.start()
 
                         
\ No newline at end of file
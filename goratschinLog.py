@@ -0,0 +1,29 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+# Logging of GoratschinChess to a file, off the hot path.
+# The thread which sends 'bestmove' only puts the log record into a queue. A background
+# thread formats the record and writes it to a file, which is rotated by size.
+
+
+# hands records to the writer thread as they are, so that the message
+# is formatted there and not on the logging thread
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+# log to fileName through a background writer, rotating the file at maxBytes
+# and keeping backupCount old files. Returns the started writer.
+def start_file_logging(logger, fileName, maxBytes, backupCount):
+    records = queue.SimpleQueue()
+    fileHandler = logging.handlers.RotatingFileHandler(fileName, maxBytes=maxBytes, backupCount=backupCount)
+    fileHandler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    writer = logging.handlers.QueueListener(records, fileHandler)
+    logger.addHandler(LazyQueueHandler(records))
+    writer.start()
+    # write what is left in the queue on exit
+    atexit.register(writer.stop)
+    return writer
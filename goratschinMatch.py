@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+# Match runner for GoratschinChess, instead of the cutechess .bat scripts.
+# Plays a gauntlet of GoratschinChess against a list of UCI engines, several games at once:
+# each game runs in its own worker process, pinned to its own cores, so the engines of
+# one game do not compete with those of another.
+#
+#   python goratschinMatch.py -e ./engines/ -o sf10.exe "Ethereal 12.00-x64.exe" \
+#       --tc 80/300+1 --openings Hert500.pgn --rounds 4 --pgnout match-1.pgn
+#
+# The arguments of GoratschinChess itself are passed with --goratschin, e.g.
+# --goratschin="-e ./engines/ -n lc0.exe stockfish.exe -m 50".
+
+import argparse
+import asyncio
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import random
+import shlex
+import sys
+import time
+
+import chess
+import chess.engine
+import chess.pgn
+
+from goratschinChess import engine_command
+
+launcher = os.path.join(os.path.dirname(os.path.abspath(__file__)), "goratschinLauncher.py")
+
+goratschinName = "GoratschinChess"
+
+# what a crashed or hung engine raises: SimpleEngine gives up on an engine which does not
+# answer in time with asyncio's or concurrent.futures' TimeoutError, depending on the Python
+engineErrors = (chess.engine.EngineError, asyncio.TimeoutError, concurrent.futures.TimeoutError)
+
+
+# Time control 'moves/seconds+increment', 'seconds+increment' or 'seconds',
+# returns (moves or None, base in seconds, increment in seconds)
+def parse_tc(tc):
+    moves = None
+    if "/" in tc:
+        moves, tc = tc.split("/", 1)
+        moves = int(moves)
+    base, inc = tc.split("+", 1) if "+" in tc else (tc, "0")
+    return moves, float(base), float(inc)
+
+
+# Openings from a PGN file (the main line of every game) or an EPD file (one position a line).
+# Each opening is (FEN of the start position, moves in UCI).
+def load_openings(fileName):
+    openings = []
+    if fileName.lower().endswith(".epd"):
+        with open(fileName) as f:
+            for line in f:
+                if line.strip():
+                    board = chess.Board()
+                    board.set_epd(line.strip())
+                    openings.append((board.fen(), []))
+        return openings
+    with open(fileName) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            openings.append((game.board().fen(), [move.uci() for move in game.mainline_moves()]))
+    return openings
+
+
+# cores of this machine, split into one set per game
+def core_sets(coresPerGame):
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    count = max(1, len(cores) // coresPerGame)
+    return [cores[i * coresPerGame:(i + 1) * coresPerGame] or cores for i in range(count)]
+
+
+# worker start: take a set of cores and pin the worker to it. The engines started
+# by the worker inherit the affinity.
+def init_worker(coreQueue):
+    cores = coreQueue.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+# one game in a worker process. Returns a dict with the result and the moves.
+def play_game(job):
+    board = chess.Board(job["fen"])
+    for move in job["opening"]:
+        board.push_uci(move)
+    tcMoves, base, inc = job["tc"]
+    clocks = {chess.WHITE: base, chess.BLACK: base}
+    scores = {chess.WHITE: [], chess.BLACK: []}
+    movesMade = {chess.WHITE: 0, chess.BLACK: 0}
+    engines = {}
+    result, termination = None, None
+    try:
+        for color, name in ((chess.WHITE, job["white"]), (chess.BLACK, job["black"])):
+            engines[color] = chess.engine.SimpleEngine.popen_uci(job["commands"][name])
+        while result is None:
+            if board.is_game_over(claim_draw=True):
+                result, termination = board.result(claim_draw=True), "normal"
+                break
+            color = board.turn
+            remaining = tcMoves - movesMade[color] % tcMoves if tcMoves else None
+            if job["movetime"]:
+                limit = chess.engine.Limit(time=job["movetime"] / 1000.0)
+            else:
+                limit = chess.engine.Limit(white_clock=clocks[chess.WHITE], black_clock=clocks[chess.BLACK],
+                                           white_inc=inc, black_inc=inc, remaining_moves=remaining)
+            start = time.monotonic()
+            try:
+                played = engines[color].play(board, limit, info=chess.engine.INFO_SCORE)
+            except engineErrors:
+                result, termination = ("0-1" if color == chess.WHITE else "1-0"), "stalled connection"
+                # it would not answer quit either
+                engines.pop(color).close()
+                break
+            if not job["movetime"]:
+                clocks[color] -= time.monotonic() - start
+                if clocks[color] < -job["timeMargin"] / 1000.0:
+                    result, termination = ("0-1" if color == chess.WHITE else "1-0"), "time forfeit"
+                    break
+                clocks[color] += inc
+                if tcMoves and remaining == 1:
+                    clocks[color] += base
+            if played.move is None or not board.is_legal(played.move):
+                result, termination = ("0-1" if color == chess.WHITE else "1-0"), "illegal move"
+                break
+            board.push(played.move)
+            movesMade[color] += 1
+            score = played.info.get("score")
+            scores[color].append(score.pov(color).score() if score is not None else None)
+            result, termination = adjudicate(board, scores, job["adjudication"])
+    finally:
+        for engine in engines.values():
+            try:
+                engine.quit()
+            except engineErrors:
+                engine.close()
+    return {"round": job["round"], "white": job["white"], "black": job["black"], "fen": job["fen"],
+            "moves": [move.uci() for move in board.move_stack], "result": result, "termination": termination}
+
+
+# Resign when both engines agree for the last moves that one side is lost,
+# draw when both engines saw a drawish score for the last moves after some move number.
+# Scores are in centipawns of the side that moved, mate scores count as unknown.
+def adjudicate(board, scores, rules):
+    resignMoves, resignScore, drawNumber, drawMoves, drawScore = rules
+    white, black = scores[chess.WHITE][-resignMoves:], scores[chess.BLACK][-resignMoves:]
+    if resignMoves and len(white) == resignMoves and len(black) == resignMoves and None not in white + black:
+        if all(s <= -resignScore for s in white) and all(s >= resignScore for s in black):
+            return "0-1", "adjudication"
+        if all(s >= resignScore for s in white) and all(s <= -resignScore for s in black):
+            return "1-0", "adjudication"
+    white, black = scores[chess.WHITE][-drawMoves:], scores[chess.BLACK][-drawMoves:]
+    if drawMoves and board.fullmove_number >= drawNumber and len(white) == drawMoves and len(black) == drawMoves \
+            and None not in white + black and all(abs(s) <= drawScore for s in white + black):
+        return "1/2-1/2", "adjudication"
+    return None, None
+
+
+# Elo difference from a score, with its 95% error margin, and the likelihood of superiority
+def elo_stats(wins, draws, losses):
+    games = wins + draws + losses
+    score = (wins + draws / 2.0) / games
+    if score <= 0.0 or score >= 1.0:
+        elo, margin = (math.inf if score >= 1.0 else -math.inf), math.nan
+    else:
+        elo = -400.0 * math.log10(1.0 / score - 1.0)
+        deviation = math.sqrt((wins * (1 - score) ** 2 + losses * score ** 2 + draws * (0.5 - score) ** 2) / games)
+        low, high = score - 1.96 * deviation / math.sqrt(games), score + 1.96 * deviation / math.sqrt(games)
+        low, high = min(max(low, 1e-9), 1 - 1e-9), min(max(high, 1e-9), 1 - 1e-9)
+        margin = (-400.0 * math.log10(1.0 / high - 1.0) + 400.0 * math.log10(1.0 / low - 1.0)) / 2.0
+    los = 0.5 if wins + losses == 0 else 0.5 * (1.0 + math.erf((wins - losses) / math.sqrt(2.0 * (wins + losses))))
+    return elo, margin, los
+
+
+def write_pgn(f, game, event, site):
+    board = chess.Board(game["fen"])
+    pgn = chess.pgn.Game()
+    pgn.headers["Event"] = event
+    pgn.headers["Site"] = site
+    pgn.headers["Date"] = time.strftime("%Y.%m.%d")
+    pgn.headers["Round"] = str(game["round"])
+    pgn.headers["White"] = game["white"]
+    pgn.headers["Black"] = game["black"]
+    pgn.headers["Result"] = game["result"]
+    pgn.headers["Termination"] = game["termination"]
+    if game["fen"] != chess.STARTING_FEN:
+        pgn.setup(board)
+    node = pgn
+    for move in game["moves"]:
+        node = node.add_variation(chess.Move.from_uci(move))
+    print(pgn, file=f, end="\n\n", flush=True)
+
+
+# the jobs of a gauntlet: GoratschinChess against each opponent, for each round
+# one opening, played with both colors if repeat
+def gauntlet(opponents, openings, rounds, repeat, seed):
+    order = list(range(len(openings)))
+    if seed is not None:
+        random.Random(seed).shuffle(order)
+    jobs = []
+    index = 0
+    for roundNumber in range(1, rounds + 1):
+        for opponent in opponents:
+            fen, moves = openings[order[index % len(order)]]
+            index += 1
+            pairs = [(goratschinName, opponent), (opponent, goratschinName)] if repeat else [(goratschinName, opponent)]
+            for white, black in pairs:
+                jobs.append({"round": roundNumber, "white": white, "black": black, "fen": fen, "opening": moves})
+    return jobs
+
+
+def run(args):
+    commands = {goratschinName: [sys.executable, launcher] + shlex.split(args.goratschin, posix=(os.name != "nt"))}
+    for opponent in args.opponents:
+        commands[opponent] = engine_command(args.engineFolder, opponent)
+    openings = load_openings(args.openings) if args.openings else [(chess.STARTING_FEN, [])]
+    jobs = gauntlet(args.opponents, openings, args.rounds, not args.noRepeat, args.seed)
+    for job in jobs:
+        job.update(commands=commands, tc=parse_tc(args.tc), movetime=args.movetime, timeMargin=args.timeMargin,
+                   adjudication=(args.resignMoves, args.resignScore, args.drawMoveNumber, args.drawMoves, args.drawScore))
+
+    cores = core_sets(args.coresPerGame)
+    concurrency = args.concurrency or len(cores)
+    coreQueue = multiprocessing.Manager().Queue()
+    for i in range(concurrency):
+        coreQueue.put(cores[i % len(cores)])
+    print("{} games, {} at once, cores per game: {}".format(len(jobs), concurrency, cores[:concurrency]), flush=True)
+
+    # wins, draws, losses of GoratschinChess against each opponent
+    stats = {opponent: [0, 0, 0] for opponent in args.opponents}
+    pgnFile = open(args.pgnout, "a") if args.pgnout else None
+    with concurrent.futures.ProcessPoolExecutor(concurrency, initializer=init_worker, initargs=(coreQueue,)) as pool:
+        futures = [pool.submit(play_game, job) for job in jobs]
+        for finished, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            game = future.result()
+            if pgnFile is not None:
+                write_pgn(pgnFile, game, args.event, args.site)
+            goratschinWhite = game["white"] == goratschinName
+            opponent = game["black"] if goratschinWhite else game["white"]
+            if game["result"] == "1/2-1/2":
+                stats[opponent][1] += 1
+            elif (game["result"] == "1-0") == goratschinWhite:
+                stats[opponent][0] += 1
+            else:
+                stats[opponent][2] += 1
+            print("Finished game {} of {} ({} vs {}): {} {{{}}}".format(
+                  finished, len(jobs), game["white"], game["black"], game["result"], game["termination"]), flush=True)
+            if finished % args.ratingInterval == 0 or finished == len(jobs):
+                print_stats(stats)
+    if pgnFile is not None:
+        pgnFile.close()
+
+
+def print_stats(stats):
+    total = [sum(values) for values in zip(*stats.values())]
+    for opponent, (wins, draws, losses) in list(stats.items()) + [("all", total)]:
+        if wins + draws + losses == 0:
+            continue
+        elo, margin, los = elo_stats(wins, draws, losses)
+        print("  {} vs {}: +{} ={} -{}  Elo {:+.1f} +/- {:.1f}  LOS {:.1f} %".format(
+              goratschinName, opponent, wins, draws, losses, elo, margin, los * 100), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gauntlet of GoratschinChess against UCI engines.')
+    parser.add_argument('-e', '--engineFolder', default='./engines/', help='Folder of the opponent engines.')
+    parser.add_argument('-o', '--opponents', nargs='+', required=True, help='Opponent engine file names in the engine folder.')
+    parser.add_argument('--goratschin', default='', help='Arguments for goratschinLauncher.py, in one string.')
+    parser.add_argument('--tc', default='80/300+1', help="Time control 'moves/seconds+increment' or 'seconds+increment'.")
+    parser.add_argument('--movetime', type=int, help='Fixed time per move in ms instead of a time control.')
+    parser.add_argument('--timeMargin', type=int, default=100, help='Ms an engine may overstep its clock before it loses on time.')
+    parser.add_argument('--openings', help='PGN or EPD file with the openings.')
+    parser.add_argument('--seed', type=int, help='Use the openings in random order from this seed, in file order if not given.')
+    parser.add_argument('--noRepeat', action='store_true', help='Play each opening with one color only.')
+    parser.add_argument('--rounds', type=int, default=4, help='Number of rounds.')
+    parser.add_argument('--concurrency', type=int, help='Games at once, by default one per set of cores.')
+    parser.add_argument('--coresPerGame', type=int, default=3, help='Cores for the engines of one game: those of GoratschinChess and the opponent.')
+    parser.add_argument('--resignMoves', type=int, default=3, help='Moves both engines must see the same side lost, 0 for no resign adjudication.')
+    parser.add_argument('--resignScore', type=int, default=800, help='Centipawns at which a side is lost.')
+    parser.add_argument('--drawMoveNumber', type=int, default=50, help='Move number from which draws are adjudicated.')
+    parser.add_argument('--drawMoves', type=int, default=5, help='Moves both engines must see a draw, 0 for no draw adjudication.')
+    parser.add_argument('--drawScore', type=int, default=8, help='Centipawns within which the score is a draw.')
+    parser.add_argument('--pgnout', help='Append the games to this PGN file.')
+    parser.add_argument('--event', default='GoratschinChess gauntlet', help='Event of the PGN games.')
+    parser.add_argument('--site', default='?', help='Site of the PGN games.')
+    parser.add_argument('--ratingInterval', type=int, default=1, help='Print the ratings every this many games.')
+    run(parser.parse_args())
@@ -0,0 +1,231 @@
+import bisect
+import http.server
+import json
+import os
+import threading
+import time
+
+# Metrics of GoratschinChess for watching long tournament runs without parsing logs:
+# how fast we answer, how long we wait for the slower engine, how deep and fast the engines
+# search, how often they agree and who decides.
+# Served over HTTP on localhost in the Prometheus text format (/metrics) and as JSON
+# (/metrics.json), and/or written as JSON to a file every few seconds:
+#
+#   python goratschinLauncher.py ... --metricsPort 9111
+#   curl localhost:9111/metrics
+#
+# The numbers are only added up after our bestmove is sent, and read on another thread.
+
+# bucket bounds of the time histograms, in ms
+timeBounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+# bucket bounds of the depth histograms
+depthBounds = (5, 10, 15, 20, 25, 30, 40, 50, 60, 80)
+
+
+class Histogram:
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is above all bounds
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {"bounds": list(self.bounds), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class Metrics:
+    # Prometheus name, help text of each histogram; those by engine have a label for it
+    histograms = (
+        ("go_to_bestmove_ms", "Time from go to our bestmove, for searches by the engines."),
+        ("second_engine_wait_ms", "Time from the first to the last engine's bestmove."),
+    )
+    engine_histograms = (
+        ("first_info_ms", "Time from go to the engine's first search info."),
+        ("depth", "Depth the engine reached."),
+    )
+
+    def __init__(self, port=None, fileName=None, interval=10.0, host="127.0.0.1"):
+        self.port = port
+        self.file_name = fileName
+        self.interval = interval
+        self.host = host
+        self.roles = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._stopped = threading.Event()
+        self._started = False
+        self._reset([])
+
+    def _reset(self, roles):
+        self.roles = roles
+        self.values = {name: Histogram(timeBounds) for name, text in self.histograms}
+        self.engine_values = {name: [Histogram(depthBounds if name == "depth" else timeBounds) for role in roles]
+                              for name, text in self.engine_histograms}
+        self.nps = [0] * len(roles)          # of the last search
+        self.nodes = [0] * len(roles)        # in all searches
+        self.decided = [0] * len(roles)      # decisions for each engine's move
+        self.answers = {"engines": 0, "book": 0, "cache": 0}
+        self.agreed = 0
+
+    # serve and write the metrics, does nothing if already started
+    def start(self, roles):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._reset(roles)
+        if self.port is not None:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.metrics = self
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if self.file_name is not None:
+            threading.Thread(target=self._write_file_loop, daemon=True).start()
+
+    def address(self):
+        places = []
+        if self._server is not None:
+            places.append("http://{}:{}/metrics".format(*self._server.server_address[:2]))
+        if self.file_name is not None:
+            places.append(self.file_name)
+        return ", ".join(places)
+
+    # A search by the engines was decided. goTime, firstInfo and engineDone are perf_counter
+    # times (None if it did not happen), elapsed is ms from go to our bestmove, infos the
+    # latest main line of each engine.
+    def search_done(self, goTime, elapsed, firstInfo, engineDone, infos, agreed, decider):
+        with self._lock:
+            self.answers["engines"] += 1
+            self.values["go_to_bestmove_ms"].observe(elapsed)
+            done = [t for t in engineDone if t is not None]
+            if len(done) > 1:
+                self.values["second_engine_wait_ms"].observe((max(done) - min(done)) * 1000)
+            for i, record in enumerate(infos):
+                if firstInfo[i] is not None:
+                    self.engine_values["first_info_ms"][i].observe(max(0.0, (firstInfo[i] - goTime) * 1000))
+                if record is not None:
+                    if record.depth is not None:
+                        self.engine_values["depth"][i].observe(record.depth)
+                    if record.nps is not None:
+                        self.nps[i] = record.nps
+                    if record.nodes is not None:
+                        self.nodes[i] += record.nodes
+            self.decided[decider] += 1
+            self.agreed += agreed
+
+    # a go answered without the engines, from the book or the cache
+    def answered(self, source):
+        with self._lock:
+            self.answers[source] += 1
+
+    def snapshot(self):
+        with self._lock:
+            searches = self.answers["engines"]
+            return {
+                "time": round(time.time(), 3),
+                "engines": list(self.roles),
+                "answers": dict(self.answers),
+                "agreed": self.agreed,
+                "agreement_rate": self.agreed / searches if searches else None,
+                "decided": dict(zip(self.roles, self.decided)),
+                "nps": dict(zip(self.roles, self.nps)),
+                "nodes": dict(zip(self.roles, self.nodes)),
+                "histograms": {name: self.values[name].snapshot() for name, text in self.histograms},
+                "engine_histograms": {name: dict(zip(self.roles, (h.snapshot() for h in self.engine_values[name])))
+                                      for name, text in self.engine_histograms},
+            }
+
+    # the metrics in the Prometheus text format
+    def prometheus(self):
+        data = self.snapshot()
+        lines = []
+        for name, text in self.histograms:
+            lines += histogram_lines("goratschin_" + name, text, [("", data["histograms"][name])])
+        for name, text in self.engine_histograms:
+            lines += histogram_lines("goratschin_engine_" + name, text,
+                                     [('engine="{}"'.format(role), value) for role, value in data["engine_histograms"][name].items()])
+        lines += ["# HELP goratschin_answers_total Moves we played, by where they came from.",
+                  "# TYPE goratschin_answers_total counter"]
+        lines += ['goratschin_answers_total{{source="{}"}} {}'.format(source, count) for source, count in data["answers"].items()]
+        lines += ["# HELP goratschin_agreed_total Searches in which all engines played the same move.",
+                  "# TYPE goratschin_agreed_total counter",
+                  "goratschin_agreed_total {}".format(data["agreed"])]
+        lines += ["# HELP goratschin_decided_total Searches decided for the engine's move.",
+                  "# TYPE goratschin_decided_total counter"]
+        lines += ['goratschin_decided_total{{engine="{}"}} {}'.format(role, count) for role, count in data["decided"].items()]
+        lines += ["# HELP goratschin_engine_nps Nodes per second of the engine's last search.",
+                  "# TYPE goratschin_engine_nps gauge"]
+        lines += ['goratschin_engine_nps{{engine="{}"}} {}'.format(role, nps) for role, nps in data["nps"].items()]
+        lines += ["# HELP goratschin_engine_nodes_total Nodes the engine searched.",
+                  "# TYPE goratschin_engine_nodes_total counter"]
+        lines += ['goratschin_engine_nodes_total{{engine="{}"}} {}'.format(role, nodes) for role, nodes in data["nodes"].items()]
+        return "\n".join(lines) + "\n"
+
+    def write_file(self):
+        temp = self.file_name + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(temp, self.file_name)
+
+    def _write_file_loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write_file()
+            except OSError:
+                pass
+
+    def close(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.file_name is not None and self._started:
+            try:
+                self.write_file()
+            except OSError:
+                pass
+
+
+# lines of a histogram in the Prometheus text format, for each (label, snapshot)
+def histogram_lines(name, text, series):
+    lines = ["# HELP " + name + " " + text, "# TYPE " + name + " histogram"]
+    for label, value in series:
+        labels = label + "," if label else ""
+        total = 0
+        for bound, count in zip(value["bounds"] + ["+Inf"], value["counts"]):
+            total += count
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(name, labels, bound, total))
+        suffix = "{" + label + "}" if label else ""
+        lines.append("{}_sum{} {}".format(name, suffix, value["sum"]))
+        lines.append("{}_count{} {}".format(name, suffix, value["count"]))
+    return lines
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path == "/metrics":
+            body, contentType = metrics.prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, contentType = json.dumps(metrics.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # no access log on stderr
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,10 @@
+# Values of GoratschinChess's own UCI options, as the GUI sends them with setoption.
+# A GUI may send anything, a bad value must never take the engine down.
+
+
+# the value of a spin option within low..high, the current value if it is not a number
+def spin_value(value, current, low, high):
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return current
@@ -0,0 +1,108 @@
+import sys
+import threading
+
+from goratschinOptions import spin_value
+
+# Output of GoratschinChess to the GUI.
+#
+# Two engines can send hundreds of info lines per second, and flushing each one
+# floods the GUI pipe with syscalls. So engine progress lines are coalesced:
+# within a time window only the latest line of each engine is kept, and all of them
+# are written with a single flush when the window ends. Optionally, a line is only
+# forwarded when the depth or the PV changed.
+# Everything else, like bestmove and readyok, is written and flushed at once,
+# after the pending progress lines.
+
+
+class GuiOutput:
+    # UCI options of the output policy: name, attribute, type, default, min, max
+    options = (
+        ("InfoWindow", "window", "spin", 50, 0, 1000),          # ms to coalesce info lines, 0 forwards each one
+        ("InfoChangesOnly", "changes_only", "check", True, None, None),
+    )
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        for name, attr, optType, default, low, high in self.options:
+            setattr(self, attr, default)
+        # function(delay, fn) which calls fn after delay seconds, a timer thread if not set
+        self.schedule = None
+        self._lock = threading.Lock()
+        # engine index -> (header, record) waiting for the end of the window
+        self._pending = {}
+        # engine index -> (depth, pv) of the last forwarded line
+        self._last = {}
+
+    # set an option by its UCI name, returns False if it is not one of ours
+    def set_option(self, name, value):
+        for optName, attr, optType, default, low, high in self.options:
+            if optName.lower() == name.lower():
+                if optType == "check":
+                    setattr(self, attr, value == "true")
+                else:
+                    setattr(self, attr, spin_value(value, getattr(self, attr), low, high))
+                return True
+        return False
+
+    def uci_options(self):
+        result = []
+        for name, attr, optType, default, low, high in self.options:
+            if optType == "check":
+                result.append("option name {} type check default {}".format(name, "true" if default else "false"))
+            else:
+                result.append("option name {} type spin default {} min {} max {}".format(name, default, low, high))
+        return result
+
+    # write a line and flush at once
+    def write(self, text):
+        with self._lock:
+            self._write_pending()
+            self.stream.write(str(text) + "\n")
+            self.stream.flush()
+
+    # a new search starts, forward its first lines whatever the last search said
+    def new_search(self):
+        with self._lock:
+            self._last.clear()
+
+    # an engine progress line, preceded by a header line naming the engine
+    def info(self, index, header, record):
+        key = (record.depth, record.pv)
+        with self._lock:
+            if self.changes_only and self._last.get(index) == key:
+                return
+            if self.window <= 0:
+                self._last[index] = key
+                self.stream.write(header + "\n" + record.line + "\n")
+                self.stream.flush()
+                return
+            first = not self._pending
+            self._pending[index] = (header, record)
+            if first:
+                self._schedule(self.window / 1000.0, self.flush)
+
+    # write the pending progress lines with one flush
+    def flush(self):
+        with self._lock:
+            if self._write_pending():
+                self.stream.flush()
+
+    def _write_pending(self):
+        if not self._pending:
+            return False
+        lines = []
+        for index, (header, record) in self._pending.items():
+            lines.append(header)
+            lines.append(record.line)
+            self._last[index] = (record.depth, record.pv)
+        self._pending.clear()
+        self.stream.write("\n".join(lines) + "\n")
+        return True
+
+    def _schedule(self, delay, fn):
+        if self.schedule is not None:
+            self.schedule(delay, fn)
+        else:
+            timer = threading.Timer(delay, fn)
+            timer.daemon = True
+            timer.start()
@@ -0,0 +1,51 @@
+import json
+import os
+import threading
+import time
+
+# Records every decision of GoratschinChess as one JSON line: the position, each
+# engine's final move, score and depth, and what was decided.
+# goratschinReplay.py loads these records to tune the decision policy offline.
+# Several GoratschinChess instances may share one recorder, e.g. the engine sets of
+# goratschinDaemon.py, each with its own games.
+
+
+class MoveRecorder:
+
+    def __init__(self, fileName):
+        self._file = open(fileName, "a")
+        self._lock = threading.Lock()
+        # tells the games of different runs apart when records are collected in one file
+        self._session = "{}-{}".format(os.getpid(), int(time.time()))
+        self._games = 0
+
+    # a new game starts, write out what we have. Returns the id of the game for record.
+    def new_game(self):
+        with self._lock:
+            self._games += 1
+            if not self._file.closed:
+                self._file.flush()
+            return self._session + "-" + str(self._games)
+
+    # scores are in pawns, relative to the side to move, None if unknown
+    def record(self, game, board, moves, scores, depths, decision, decider, rule, margin):
+        line = json.dumps({
+            "game": game,
+            "ply": board.ply(),
+            "fen": board.fen(),
+            "moves": moves,
+            "scores": scores,
+            "depths": depths,
+            "decision": decision,
+            "decider": decider,
+            "rule": rule,
+            "margin": margin,
+        }) + "\n"
+        # whole lines only, whichever instance writes
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
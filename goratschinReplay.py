@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+# Offline replay of recorded GoratschinChess decisions, for tuning the decision policy.
+#
+# Run GoratschinChess with --record to get one JSON line per decision, and keep the PGN
+# of the games (e.g. cutechess -pgnout). This tool loads the records into NumPy arrays
+# and evaluates a sweep of margins and the alternative decision rules all at once
+# against the outcomes of the games, instead of one gauntlet per setting:
+#
+#   python goratschinReplay.py records.jsonl --pgn match-1.pgn --margins 0 300 5
+#
+# For each policy it reports how often it follows a counselor, how often it plays
+# another move than the boss, the mean result of the games at the moves where it deviates
+# from the boss, and the Brier score of the chosen engine's expectation against the result.
+# Policies are ranked by the deviation result, the Brier score breaks ties. Policies with
+# fewer deviations than --minDeviations come last, their few results are mostly noise.
+#
+# Both are only hints. The results are those of the recorded games, in which the recorded
+# policy played, so a deviation the recorded policy did not make is judged by a game in
+# which the boss's move was played. The Brier score measures how well the chosen engine's
+# scores are calibrated, not whether its moves are better, and favors the engine with the
+# better calibrated scale.
+#
+# Needs numpy, which GoratschinChess itself does not: pip install numpy
+
+import argparse
+import collections
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("goratschinReplay.py needs numpy: pip install numpy")
+import chess.pgn
+
+from goratschinTimeline import cp2q
+
+
+# positions are matched on placement, side to move, castling and en passant
+def position_key(fen):
+    return " ".join(fen.split()[:4])
+
+
+def load_records(fileNames):
+    records = []
+    for fileName in fileNames:
+        with open(fileName) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    return records
+
+
+# result of the game from white's view (1, 0.5 or 0) for every position of every game
+def load_outcomes(pgnFileNames):
+    results = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+    outcomes = {}
+    for fileName in pgnFileNames:
+        with open(fileName) as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                result = results.get(game.headers.get("Result"))
+                if result is None:
+                    continue
+                board = game.board()
+                outcomes[position_key(board.fen())] = result
+                for move in game.mainline_moves():
+                    board.push(move)
+                    outcomes[position_key(board.fen())] = result
+    return outcomes
+
+
+# Arrays over all decisions of games with a known outcome:
+# scores (moves x engines, NaN if unknown), move codes (-1 if none), the result for the
+# side to move, and the recorded decider.
+def build_arrays(records, outcomes):
+    games = collections.OrderedDict()
+    for record in records:
+        games.setdefault(record["game"], []).append(record)
+
+    kept = []
+    for gameRecords in games.values():
+        # the deepest positions are the least ambiguous ones
+        for record in reversed(gameRecords):
+            result = outcomes.get(position_key(record["fen"]))
+            if result is not None:
+                kept.extend((record, result) for record in gameRecords)
+                break
+
+    count = len(kept)
+    engines = max((len(record["moves"]) for record, result in kept), default=2)
+    scores = np.full((count, engines), np.nan)
+    codes = np.full((count, engines), -1, dtype=np.int32)
+    outcome = np.empty(count)
+    decider = np.zeros(count, dtype=np.int32)
+    moveCodes = {}
+    for row, (record, result) in enumerate(kept):
+        for i, move in enumerate(record["moves"]):
+            if move is not None:
+                codes[row, i] = moveCodes.setdefault(move, len(moveCodes))
+            score = record["scores"][i]
+            if score is not None:
+                scores[row, i] = score
+        whiteToMove = record["fen"].split()[1] == "w"
+        outcome[row] = result if whiteToMove else 1.0 - result
+        decider[row] = record["decider"]
+    return scores, codes, outcome, decider, len(games), len(set(record["game"] for record, result in kept))
+
+
+# expected result from a score in pawns, goratschinTimeline.cp2q mapped to 0..1
+def expectation(scores):
+    q = cp2q(scores, np.arctan)
+    return (q + 1.0) / 2.0
+
+
+# Rule 'margin' for all margins (in pawns) at once: follow the best counselor with another
+# move than the boss if it beats the boss by the margin. Returns the chosen engine per
+# margin and decision. As GoratschinChess._decide_margin: an unknown score ranks a counselor
+# last, and makes the difference 0 (goratschinChess.score_diff). Without a boss move the
+# best engine with a move plays.
+def margin_policy(scores, codes, margins):
+    rows = np.arange(scores.shape[0])
+    differs = (codes[:, 1:] != codes[:, :1]) & (codes[:, 1:] >= 0)
+    key = np.where(differs, np.nan_to_num(scores[:, 1:], nan=-1e300), -np.inf)
+    best = key.argmax(axis=1) + 1
+    diff = scores[rows, best] - scores[:, 0]
+    diff = np.where(np.isnan(diff), 0.0, diff)
+    diff = np.where(differs.any(axis=1), diff, -np.inf)
+    follow = diff[None, :] >= margins[:, None]
+    chosen = np.where(follow, best[None, :], 0)
+    bestWithMove = np.where(codes >= 0, np.nan_to_num(scores, nan=-1e300), -np.inf).argmax(axis=1)
+    return np.where((codes[:, 0] < 0)[None, :], bestWithMove[None, :], chosen)
+
+
+# Rule 'majority': the move most engines play, the boss wins among them.
+# Without a clear majority the margin rule decides.
+def majority_policy(scores, codes, margin):
+    valid = codes >= 0
+    votes = ((codes[:, :, None] == codes[:, None, :]) & valid[:, :, None] & valid[:, None, :]).sum(axis=2)
+    most = votes.max(axis=1)
+    top = (votes == most[:, None]) & valid
+    tie = top.sum(axis=1) // np.maximum(most, 1) > 1
+    key = np.where(top, np.nan_to_num(scores, nan=-1e9), -np.inf)
+    key[:, 0] = np.where(top[:, 0], np.inf, -np.inf)
+    fallback = margin_policy(scores, codes, np.array([margin]))[0]
+    return np.where(tie, fallback, key.argmax(axis=1))
+
+
+# quality of the chosen engines (policies x decisions) against the outcomes
+def evaluate(chosen, scores, codes, outcome):
+    rows = np.arange(scores.shape[0])[None, :]
+    chosenScores = scores[rows, chosen]
+    error = (expectation(chosenScores) - outcome[None, :]) ** 2
+    brier = np.nanmean(np.where(np.isnan(chosenScores), np.nan, error), axis=1)
+    deviates = codes[rows, chosen] != codes[:, :1].T
+    counselorRate = (chosen != 0).mean(axis=1)
+    deviationRate = deviates.mean(axis=1)
+    deviated = deviates.sum(axis=1)
+    deviationResult = np.where(deviated > 0, (deviates * outcome[None, :]).sum(axis=1) / np.maximum(deviated, 1), np.nan)
+    return counselorRate, deviationRate, deviated, brier, deviationResult
+
+
+def run(args):
+    records = load_records(args.records)
+    outcomes = load_outcomes(args.pgn) if args.pgn else {}
+    scores, codes, outcome, decider, gameCount, knownCount = build_arrays(records, outcomes)
+    print("{} decisions in {} games, {} games with a known result".format(len(records), gameCount, knownCount))
+    if scores.shape[0] == 0:
+        print("no decisions to evaluate, give the PGN of the recorded games with --pgn")
+        return
+
+    start, stop, step = args.margins
+    margins = np.arange(start, stop + step / 2.0, step) / 100.0
+    names = ["margin {:4d} cp".format(int(round(m * 100))) for m in margins]
+    chosen = [margin_policy(scores, codes, margins)]
+    names += ["boss only", "best score"]
+    chosen.append(margin_policy(scores, codes, np.array([np.inf, 1e-9])))
+    if scores.shape[1] > 2:
+        names.append("majority {:d} cp".format(args.majorityMargin))
+        chosen.append(majority_policy(scores, codes, args.majorityMargin / 100.0)[None, :])
+    names.append("recorded")
+    chosen.append(decider[None, :])
+    chosen = np.concatenate(chosen)
+
+    counselorRate, deviationRate, deviated, brier, deviationResult = evaluate(chosen, scores, codes, outcome)
+
+    # best deviation result first, policies which deviate too rarely to tell last
+    ranked = (deviated >= args.minDeviations) & ~np.isnan(deviationResult)
+    order = np.lexsort((brier, np.where(ranked, -deviationResult, np.inf)))
+    print("{:16s} {:>10s} {:>10s} {:>9s} {:>10s} {:>8s}".format("policy", "counselor", "deviates", "dev moves", "dev result", "brier"))
+    for k in order[:args.top]:
+        print("{:16s} {:9.1f}% {:9.1f}% {:9d} {:>10s} {:8.4f}".format(
+              names[k], counselorRate[k] * 100, deviationRate[k] * 100, deviated[k],
+              "-" if np.isnan(deviationResult[k]) else "{:.3f}".format(deviationResult[k]), brier[k]))
+    print("dev result: mean result of the recorded games at the policy's deviations from the boss, "
+          "only the recorded policy's deviations were played. brier: calibration of the chosen "
+          "engine's scores, not the quality of its moves. Policies with fewer than {} deviations "
+          "are ranked last.".format(args.minDeviations))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Evaluate GoratschinChess decision policies on recorded decisions.')
+    parser.add_argument('records', nargs='+', help='Record files written with goratschinLauncher.py --record.')
+    parser.add_argument('--pgn', nargs='+', help='PGN files with the results of the recorded games.')
+    parser.add_argument('--margins', nargs=3, type=int, default=[0, 300, 5], metavar=('START', 'STOP', 'STEP'),
+                        help='Margins in centipawns to sweep.')
+    parser.add_argument('--majorityMargin', type=int, default=50, help='Margin in centipawns of the majority rule without a majority.')
+    parser.add_argument('--minDeviations', type=int, default=30,
+                        help='Deviations from the boss a policy needs to be ranked by its deviation result.')
+    parser.add_argument('--top', type=int, default=20, help='Number of best policies to show.')
+    run(parser.parse_args())
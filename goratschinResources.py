@@ -0,0 +1,83 @@
+import os
+
+# Resource planner of GoratschinChess.
+# All engines run on the same machine at the same time. Broadcasting the GUI's
+# 'Threads' and 'Hash' to each of them oversubscribes the cores and the RAM by the
+# number of engines. So the GUI's values are taken as the budget of GoratschinChess
+# as a whole and split between the engines by their shares. Each engine process is
+# pinned to its own set of cores, so the engines do not compete for them.
+
+
+class ResourcePlanner:
+    # options whose value is split between the engines instead of broadcast
+    planned_options = ("threads", "hash")
+
+    def __init__(self, count, coreShares=None, hashShares=None, pinning=True):
+        self.count = count
+        self.core_shares = list(coreShares) if coreShares else [1] * count
+        self.hash_shares = list(hashShares) if hashShares else [1] * count
+        if len(self.core_shares) != count or len(self.hash_shares) != count:
+            raise ValueError("need one share per engine, " + str(count) + " engines")
+        self.pinning = pinning and hasattr(os, "sched_setaffinity")
+        if hasattr(os, "sched_getaffinity"):
+            self.cores = sorted(os.sched_getaffinity(0))
+        else:
+            self.cores = list(range(os.cpu_count() or 1))
+        self.core_sets = self._core_sets()
+
+    # Split the available cores by the shares, in blocks of neighbouring cores.
+    # With fewer cores than engines, engines share them.
+    def _core_sets(self):
+        if len(self.cores) < self.count:
+            return [self.cores] * self.count
+        counts = split(len(self.cores), self.core_shares)
+        sets = []
+        start = 0
+        for n in counts:
+            sets.append(self.cores[start:start + n])
+            start += n
+        return sets
+
+    # the setoption command for one engine: Threads and Hash get the engine's share
+    # of the value, everything else is passed as it is
+    def option_command(self, index, name, value, cmd):
+        if name is None or value is None or name.lower() not in self.planned_options:
+            return cmd
+        try:
+            total = int(value)
+        except ValueError:
+            return cmd
+        shares = self.core_shares if name.lower() == "threads" else self.hash_shares
+        return "setoption name " + name + " value " + str(split(total, shares)[index])
+
+    def is_planned(self, name):
+        return name is not None and name.lower() in self.planned_options
+
+    # pin an engine process to its cores, does nothing if the OS can not
+    def pin(self, index, pid):
+        if self.pinning:
+            try:
+                os.sched_setaffinity(pid, self.core_sets[index])
+            except OSError:
+                pass
+
+    def describe(self):
+        return ", ".join("engine {}: cores {}".format(i, format_cores(cores)) for i, cores in enumerate(self.core_sets)) \
+            + ("" if self.pinning else " (not pinned)")
+
+
+# split total by the shares, largest remainder first, at least 1 each
+def split(total, shares):
+    weight = float(sum(shares))
+    exact = [total * share / weight for share in shares]
+    parts = [int(x) for x in exact]
+    rest = total - sum(parts)
+    for i in sorted(range(len(shares)), key=lambda i: exact[i] - parts[i], reverse=True)[:max(0, rest)]:
+        parts[i] += 1
+    return [max(1, part) for part in parts]
+
+
+def format_cores(cores):
+    if cores and cores == list(range(cores[0], cores[-1] + 1)):
+        return "{}-{}".format(cores[0], cores[-1]) if len(cores) > 1 else str(cores[0])
+    return ",".join(str(core) for core in cores)
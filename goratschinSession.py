@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+
+# A UCI session with a GoratschinChess in the same process, used by the batch analysis
+# (goratschinBatch.py) and the bench command (goratschinBench.py) to search positions
+# through the full decision path and get the results as records, not as text.
+
+
+# whether a move solves a position, None if the position has no bm or am
+def solves(position, move):
+    if not position["bm"] and not position["am"]:
+        return None
+    if position["bm"] and move not in position["bm"]:
+        return False
+    return move not in position["am"]
+
+
+# A UCI session with a GoratschinChess in this process, see GoratschinChess.serve.
+# It is the input and output of the session, and takes the place of the analysis stream
+# (see goratschinStream.py), from which it gets the engines' lines and the decision.
+class Session:
+
+    def __init__(self):
+        self._commands = queue.Queue()
+        self._done = threading.Event()
+        self._position = None
+        self._engines_seen = {}
+        self._result = None
+        # like AnalysisStream: records are only built while someone listens
+        self.subscribers = ()
+        self.engines = []
+
+    def serve(self, goratschin):
+        self.goratschin = goratschin
+        self._thread = threading.Thread(target=goratschin.serve, args=(self, self), daemon=True)
+        self._thread.start()
+
+    def send(self, command):
+        self._commands.put(command + "\n")
+
+    # input of the session
+    def readline(self):
+        return self._commands.get()
+
+    # output of the session, the results come through publish
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    # the analysis stream of the session
+    def start(self, engines):
+        self.engines = engines
+
+    def address(self):
+        return "batch session"
+
+    def publish(self, data):
+        if data["type"] == "info" and data["pv"]:
+            engine = self._engines_seen.setdefault(data["engine"], {"solvedAt": None})
+            for key in ("depth", "nodes", "nps", "ms"):
+                engine[key] = data[key]
+            if solves(self._position, data["pv"][0]):
+                if engine["solvedAt"] is None:
+                    engine["solvedAt"] = data["ms"] if data["ms"] is not None else self._elapsed()
+            else:
+                engine["solvedAt"] = None
+        elif data["type"] == "bestmove":
+            self._result = data
+            self._result["elapsed"] = self._elapsed()
+            self.subscribers = ()
+            self._done.set()
+
+    def _elapsed(self):
+        return int((time.perf_counter() - self._go_time) * 1000)
+
+    # analyze a position with the go command, returns the result dict
+    def analyse(self, position, goCommand, timeout):
+        self._position = position
+        self._engines_seen = {}
+        self._result = None
+        self._done.clear()
+        self.send("ucinewgame")
+        self.send("position fen " + position["fen"])
+        self._go_time = time.perf_counter()
+        self.subscribers = (self,)
+        self.send(goCommand)
+        if not self._done.wait(timeout):
+            self.send("stop")
+            self._done.wait(timeout)
+        result = {"id": position["id"], "fen": position["fen"], "bm": position["bm"], "am": position["am"]}
+        data = self._result or {}
+        result["move"] = data.get("move")
+        result["source"] = data.get("source")
+        result["decider"] = data.get("role")
+        result["ms"] = data.get("elapsed")
+        result["solved"] = solves(position, result["move"]) if result["move"] is not None else None
+        moves = data.get("moves") or [None] * len(self.engines)
+        scores = data.get("scores") or [None] * len(self.engines)
+        result["engines"] = []
+        for i, engine in enumerate(self.engines):
+            seen = self._engines_seen.get(i, {})
+            result["engines"].append({
+                "role": engine["role"], "name": engine["name"], "move": moves[i],
+                "score": int(round(scores[i] * 100)) if scores[i] is not None else None,
+                "depth": seen.get("depth"), "nodes": seen.get("nodes"), "nps": seen.get("nps"), "searchMs": seen.get("ms"),
+                "solved": solves(position, moves[i]) if moves[i] is not None else None,
+                "solvedAt": seen.get("solvedAt")})
+        return result
+
+    # end the session, the engines keep running
+    def close(self):
+        self.send("quit")
+        self._thread.join(10)
@@ -0,0 +1,162 @@
+import collections
+import json
+import os
+import socketserver
+import threading
+import time
+
+# Stream of the engines' analysis as JSON lines, for dashboards and analysis bots
+# which share one running set of engines with the GUI.
+# Subscribers connect to a local Unix socket or TCP port and get one JSON object per line:
+#
+#   {"type": "hello", "engines": [{"set": 0, "engine": 0, "role": "boss", "name": "lc0.exe"}, ...]}
+#   {"type": "go", "set": 0, "search": 7, "fen": "...", "command": "go infinite"}
+#   {"type": "info", "set": 0, "search": 7, "engine": 0, "role": "boss", "depth": 12, "score": {"cp": 31}, "pv": [...], ...}
+#   {"type": "bestmove", "set": 0, "search": 7, "source": "engines", "move": "e2e4", "ponder": "e7e5", "decider": 0, ...}
+#   {"type": "dropped", "count": 250}
+#
+# Several sets of engines may publish to one stream, see goratschinDaemon.py --pairs.
+# Search numbers and engine indexes count within a set.
+#
+# The engine output is read on one thread, which must never wait for a subscriber. So each
+# subscriber has its own bounded queue, written by its own thread. When a subscriber does not
+# read fast enough, its oldest lines are dropped and it is told how many.
+
+
+# lines waiting for one subscriber
+class Subscriber:
+
+    def __init__(self, size):
+        self._lines = collections.deque(maxlen=size)
+        self._ready = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    # never blocks, drops the oldest line if the queue is full
+    def put(self, line):
+        with self._ready:
+            if len(self._lines) == self._lines.maxlen:
+                self.dropped += 1
+            self._lines.append(line)
+            self._ready.notify()
+
+    # the next line to send, a 'dropped' line first if lines were lost. None when closed.
+    def get(self):
+        with self._ready:
+            while not self._lines and not self.closed:
+                self._ready.wait()
+            if self.closed:
+                return None
+            if self.dropped:
+                line = encode({"type": "dropped", "count": self.dropped})
+                self.dropped = 0
+                return line
+            return self._lines.popleft()
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+
+class SubscriberHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        stream = self.server.stream
+        subscriber = Subscriber(stream.queue_size)
+        subscriber.put(encode(stream.hello))
+        stream.add(subscriber)
+        try:
+            while True:
+                line = subscriber.get()
+                if line is None:
+                    break
+                self.wfile.write(line)
+        except OSError:
+            pass
+        finally:
+            stream.remove(subscriber)
+
+
+class AnalysisStream:
+    # lines kept for a subscriber which does not read fast enough
+    queue_size = 1000
+
+    # a Unix socket at socketPath, or a TCP port on host if port is given
+    def __init__(self, socketPath=None, port=None, host="127.0.0.1"):
+        self.socket_path = socketPath
+        self.port = port
+        self.host = host
+        self.hello = {"type": "hello", "engines": []}
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    # listen for subscribers on a background thread, does nothing if already listening.
+    # engines are those of one set, which replace what hello knew about that set.
+    def start(self, engines):
+        sets = set(engine["set"] for engine in engines)
+        self.hello = {"type": "hello", "engines": [engine for engine in self.hello["engines"] if engine["set"] not in sets] + engines}
+        if self._server is not None:
+            return
+        if self.port is not None or not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            server = socketserver.ThreadingTCPServer((self.host, self.port or 0), SubscriberHandler, bind_and_activate=False)
+            server.allow_reuse_address = True
+            server.server_bind()
+            server.server_activate()
+        else:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            server = socketserver.ThreadingUnixStreamServer(self.socket_path, SubscriberHandler)
+        server.daemon_threads = True
+        server.stream = self
+        self._server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def address(self):
+        if isinstance(self._server, socketserver.ThreadingTCPServer):
+            return "{}:{}".format(*self._server.server_address[:2])
+        return self.socket_path
+
+    def add(self, subscriber):
+        with self._lock:
+            self.subscribers = self.subscribers + [subscriber]
+
+    def remove(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self.subscribers = [s for s in self.subscribers if s is not subscriber]
+
+    # send data to all subscribers. Check self.subscribers first to build data only if anyone listens.
+    def publish(self, data):
+        subscribers = self.subscribers
+        if not subscribers:
+            return
+        line = encode(data)
+        for subscriber in subscribers:
+            subscriber.put(line)
+
+    def close(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        for subscriber in self.subscribers:
+            subscriber.close()
+        if self.socket_path is not None and self.port is None and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = None
+
+
+def encode(data):
+    return (json.dumps(data, separators=(",", ":")) + "\n").encode()
+
+
+# the JSON record of an engine's info line
+def info_data(setId, searchId, index, role, record):
+    data = {"type": "info", "time": round(time.time(), 3), "set": setId, "search": searchId, "engine": index, "role": role,
+            "depth": record.depth, "seldepth": record.seldepth, "multipv": record.multipv,
+            "nodes": record.nodes, "nps": record.nps, "ms": record.time, "pv": list(record.pv)}
+    if record.score_type is not None:
+        data["score"] = {record.score_type: record.score}
+    return data
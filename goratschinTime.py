@@ -0,0 +1,110 @@
+import collections
+
+import chess
+
+from goratschinOptions import spin_value
+
+# Time management for GoratschinChess.
+# Instead of handing a scaled clock to both engines, GoratschinChess budgets the time
+# for every move itself and sends both engines the same 'go movetime'.
+# The hard cap is a watchdog: if an engine has not answered by then, GoratschinChess
+# stops the search and decides on what the engines found so far.
+
+
+# non pawn material of the start position, used for the game phase
+_start_material = 2 * (9 + 2 * 5 + 2 * 3 + 2 * 3)
+_piece_values = {chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9}
+
+
+# game phase from 1.0 (all pieces on the board) to 0.0 (pawn endgame)
+def game_phase(board):
+    material = 0
+    for piece, value in _piece_values.items():
+        material += value * len(board.pieces(piece, chess.WHITE))
+        material += value * len(board.pieces(piece, chess.BLACK))
+    return min(1.0, material / _start_material)
+
+
+class TimeManager:
+    # UCI options of the time manager: name, attribute, default, min, max
+    options = (
+        ("TimeFactor", "time_factor", 100, 10, 500),           # percent of the normal budget
+        ("TimeOverhead", "move_overhead", 30, 0, 5000),        # ms kept back for the GUI and the pipes
+        ("MinThinkTime", "min_think_time", 20, 1, 5000),       # ms per move at least
+        ("MaxTimeRatio", "max_time_ratio", 300, 100, 1000),    # hard cap in percent of the target
+        ("DisagreeTimeBonus", "disagree_bonus", 30, 0, 200),   # percent more after a disagreement
+        ("AgreeTimeSaving", "agree_saving", 20, 0, 90),        # percent less when the engines agreed lately
+    )
+
+    # number of recent moves for the agreement history
+    history_length = 4
+
+    # weight of a new sample in the moving average of our own overhead
+    overhead_alpha = 0.3
+
+    def __init__(self):
+        for name, attr, default, low, high in self.options:
+            setattr(self, attr, default)
+        # measured overhead of GoratschinChess per move, in ms
+        self.measured_overhead = 0.0
+        self._agreements = collections.deque(maxlen=self.history_length)
+
+    # set an option by its UCI name, returns False if it is not one of ours
+    def set_option(self, name, value):
+        for optName, attr, default, low, high in self.options:
+            if optName.lower() == name.lower():
+                setattr(self, attr, spin_value(value, getattr(self, attr), low, high))
+                return True
+        return False
+
+    def uci_options(self):
+        return ["option name {} type spin default {} min {} max {}".format(name, default, low, high)
+                for name, attr, default, low, high in self.options]
+
+    def new_game(self):
+        self._agreements.clear()
+
+    # Budget for one move in ms: the target time for the engines' search and the hard cap
+    # after which GoratschinChess stops them.
+    # clock and inc are those of the side to move, movestogo may be None.
+    def budget(self, clock, inc, movestogo, board):
+        available = max(1.0, clock - self.move_overhead)
+
+        if movestogo:
+            movesLeft = movestogo
+        else:
+            # more moves to come in the opening than in the endgame
+            movesLeft = 20 + 30 * game_phase(board)
+
+        target = available / movesLeft + 0.8 * inc
+        target *= self.time_factor / 100.0 * self._agreement_factor()
+
+        # never plan to use more than a share of the clock on one move
+        limit = available * (0.8 if movesLeft <= 1 else 0.4)
+        target = min(target, limit)
+        hardCap = min(target * self.max_time_ratio / 100.0, limit)
+
+        # the engines get what is left after our own overhead
+        target = max(self.min_think_time, target - self.measured_overhead)
+        hardCap = max(target, hardCap - self.measured_overhead)
+        return int(target), int(hardCap)
+
+    # more time when the engines disagreed on the last move,
+    # less when they agreed on all recent moves
+    def _agreement_factor(self):
+        if not self._agreements:
+            return 1.0
+        if not self._agreements[-1]:
+            return 1.0 + self.disagree_bonus / 100.0
+        if len(self._agreements) == self.history_length and all(self._agreements):
+            return 1.0 - self.agree_saving / 100.0
+        return 1.0
+
+    # Called after each decision.
+    # elapsed is the time from 'go' to our bestmove, searchTime the time the engines
+    # reported for their search, both in ms. The difference is our overhead.
+    def move_done(self, agreed, elapsed, searchTime):
+        self._agreements.append(agreed)
+        if searchTime is not None:
+            sample = max(0.0, elapsed - searchTime)
+            self.measured_overhead += self.overhead_alpha * (sample - self.measured_overhead)
@@ -0,0 +1,141 @@
+import array
+import json
+import math
+
+# The evaluation timeline of one game: the score and depth of each engine, the decision and
+# whether the engines agreed, for every move GoratschinChess searched, in compact arrays.
+# Adding a move only appends numbers. The analysis runs once per game, at ucinewgame or quit,
+# over whole arrays at once: the win/draw/loss curve of each engine, how far the counselors'
+# evaluations are from the boss's, and the swing points where the evaluation of the played
+# move jumped.
+#
+# The analysis needs numpy, which GoratschinChess itself does not. Without it only the
+# counts are summarized.
+
+
+# expectation 0..1 of the side ahead for a score in pawns, from lc0_analyzer-extras.
+# With atan=np.arctan for numpy arrays of scores.
+def cp2q(pawns, atan=math.atan):
+    return atan(pawns * 100.0 / 290.680623072) / 1.548090806
+
+
+class GameTimeline:
+    # change of the expectation (-1..1) between two searched moves which is a swing
+    swing_threshold = 0.15
+
+    def __init__(self, roles):
+        self.roles = roles
+        self.clear()
+
+    def clear(self):
+        self.plies = array.array("H")
+        self.moves = []
+        # score in pawns from white's view, NaN if unknown
+        self.scores = [array.array("d") for role in self.roles]
+        # depth, -1 if unknown
+        self.depths = [array.array("h") for role in self.roles]
+        # the engine listened to, the boss if all engines agreed
+        self.deciders = array.array("b")
+        self.agreed = array.array("b")
+
+    def __len__(self):
+        return len(self.plies)
+
+    def add(self, ply, move, scoresWhite, depths, decider, agreed):
+        self.plies.append(min(ply, 65535))
+        self.moves.append(move)
+        for i in range(len(self.roles)):
+            score = scoresWhite[i]
+            self.scores[i].append(math.nan if score is None else score)
+            depth = depths[i]
+            self.depths[i].append(-1 if depth is None else min(depth, 32767))
+        self.deciders.append(decider)
+        self.agreed.append(1 if agreed else 0)
+
+    # the summary of the game as a dict, see summary_lines for the text
+    def summary(self):
+        count = len(self.plies)
+        result = {"moves": count, "roles": list(self.roles),
+                  "agreed": sum(self.agreed),
+                  "decided": {role: self.deciders.count(i) for i, role in enumerate(self.roles)}}
+        try:
+            import numpy as np
+        except ImportError:
+            result["analysis"] = "needs numpy"
+            return result
+        if count == 0:
+            return result
+
+        plies = np.frombuffer(self.plies, dtype=np.uint16).astype(np.int64)
+        scores = np.array([np.frombuffer(s, dtype=np.float64) for s in self.scores])       # engines x moves
+        depths = np.array([np.frombuffer(d, dtype=np.int16) for d in self.depths])
+        deciders = np.frombuffer(self.deciders, dtype=np.int8).astype(np.int64)
+
+        # expectation 0..1 of the side ahead, and the win/draw/loss curves from white's view
+        q = cp2q(np.abs(scores), np.arctan)
+        win = np.where(scores >= 0, q, 0.0) * 100
+        loss = np.where(scores < 0, q, 0.0) * 100
+        draw = 100 - q * 100
+        win[np.isnan(scores)] = np.nan
+        loss[np.isnan(scores)] = np.nan
+        # signed expectation from white's view, -1..1
+        signed = np.sign(scores) * q
+
+        result["plies"] = plies.tolist()
+        result["wdl"] = {role: [[round_or_none(w), round_or_none(d), round_or_none(l)]
+                                for w, d, l in zip(win[i], draw[i], loss[i])]
+                         for i, role in enumerate(self.roles)}
+        result["depth"] = {role: round_or_none(float(np.mean(depths[i][depths[i] >= 0]))
+                                               if np.any(depths[i] >= 0) else math.nan)
+                           for i, role in enumerate(self.roles)}
+
+        # divergence of each counselor from the boss, in expectation
+        divergence = {}
+        for i in range(1, len(self.roles)):
+            diff = np.abs(signed[i] - signed[0])
+            known = ~np.isnan(diff)
+            if not np.any(known):
+                continue
+            worst = int(np.nanargmax(diff))
+            divergence[self.roles[i]] = {"mean": round_or_none(float(np.nanmean(diff))),
+                                         "max": round_or_none(float(diff[worst])),
+                                         "ply": int(plies[worst]), "move": self.moves[worst]}
+        result["divergence"] = divergence
+
+        # swing points: the evaluation of the played move, by the engine listened to, changed by
+        # more than the threshold since that engine's evaluation of the last searched move.
+        # Each change is within one engine, whose scale may differ from the others'.
+        played = signed[deciders[1:], np.arange(1, count)]
+        previous = signed[deciders[1:], np.arange(count - 1)]
+        change = played - previous
+        swings = np.nonzero(np.abs(np.nan_to_num(change)) >= self.swing_threshold)[0]
+        result["swings"] = [{"ply": int(plies[k + 1]), "move": self.moves[k + 1], "by": self.roles[int(deciders[k + 1])],
+                             "change": round_or_none(float(change[k]))}
+                            for k in swings]
+        return result
+
+    # info string lines for the GUI of a summary
+    def summary_lines(self, summary):
+        count = summary["moves"]
+        lines = ["game summary: {} searched moves, engines agreed on {}, decided by {}".format(
+                 count, summary["agreed"], ", ".join("{} {}".format(role, n) for role, n in summary["decided"].items()))]
+        if "analysis" in summary:
+            lines.append("game summary: no evaluation analysis, " + summary["analysis"])
+            return lines
+        for role, value in summary.get("divergence", {}).items():
+            lines.append("game summary: {} diverged from boss by {:.2f} on average, most at ply {} ({}) by {:.2f}".format(
+                         role, value["mean"] or 0.0, value["ply"], value["move"], value["max"] or 0.0))
+        if summary.get("swings"):
+            lines.append("game summary: swings at " + ", ".join(
+                         "ply {} {} ({:+.2f})".format(swing["ply"], swing["move"], swing["change"]) for swing in summary["swings"]))
+        return lines
+
+
+def round_or_none(value, digits=3):
+    return None if value is None or math.isnan(value) else round(value, digits)
+
+
+# append a summary as one JSON line to fileName
+def write_summary(fileName, summary):
+    with open(fileName, "a") as f:
+        f.write(json.dumps(summary) + "\n")